@@ -0,0 +1,334 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import fitz  # PyMuPDF
+from PIL import Image
+
+import version_1
+import version_2
+import version_3
+from geometry import PageGeometry
+from output_sink import wait_outputs
+from svg_writer import SvgWriter, add_drawing
+from page_data import find_page_tables, read_page, close_plumber_documents
+from synthetic_pdfs import synthetic_spanning_table_pdf, synthetic_table_pdf, synthetic_tiled_image_pdf
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+def synthetic_line_page(segment_count, seed=0, cell=12.0, rows=6, cols=5):
+    """Build line shapes for a page made of ruled tables drawn cell by cell plus hairline noise.
+
+    Roughly 80% of the segments belong to tables (each cell edge is its own
+    stroke, as in our engineering drawings) and the rest are short diagonal
+    strokes that must not be picked up as grid lines.
+    """
+    rng = random.Random(seed)
+    lines = []
+    table_segments = int(segment_count * 0.8)
+    per_table = rows * (cols + 1) + cols * (rows + 1)
+    table_count = max(1, table_segments // per_table)
+    side = int(table_count ** 0.5) + 1
+    for t in range(table_count):
+        ox = (t % side) * (cols + 2) * cell
+        oy = (t // side) * (rows + 2) * cell
+        for r in range(rows + 1):
+            for c in range(cols):
+                y = oy + r * cell
+                lines.append(('l', fitz.Point(ox + c * cell, y), fitz.Point(ox + (c + 1) * cell, y)))
+        for c in range(cols + 1):
+            for r in range(rows):
+                x = ox + c * cell
+                lines.append(('l', fitz.Point(x, oy + r * cell), fitz.Point(x, oy + (r + 1) * cell)))
+    extent = side * max(rows, cols) * cell * 2
+    while len(lines) < segment_count:
+        x, y = rng.uniform(0, extent), rng.uniform(0, extent)
+        lines.append(('l', fitz.Point(x, y), fitz.Point(x + rng.uniform(3, 9), y + rng.uniform(3, 9))))
+    rng.shuffle(lines)
+    return lines, table_count
+
+def bench_grid(sizes, repeat=3):
+    """Time detect_grid_pattern on synthetic pages of increasing size."""
+    print(f"{'segments':>10} {'tables':>8} {'found':>8} {'best s':>10} {'us/segment':>11}")
+    for size in sizes:
+        lines, expected = synthetic_line_page(size)
+        segments = PageGeometry([{'items': lines}]).lines
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tables = version_1.detect_grid_pattern(segments)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{size:>10} {expected:>8} {len(tables):>8} {best:>10.3f} {best / size * 1e6:>11.2f}")
+
+def two_pass(pdf_path):
+    """The original flow: fitz for drawings and images, then pdfplumber for tables and text."""
+    document = fitz.open(pdf_path)
+    for page_number in range(document.page_count):
+        page = document.load_page(page_number)
+        page.get_drawings()
+        page.get_images(full=True)
+    document.close()
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            page.extract_tables()
+            page.extract_text()
+
+def single_pass(pdf_path):
+    """The unified flow: every part comes from one PyMuPDF parse of each page."""
+    document = fitz.open(pdf_path)
+    for page_number in range(document.page_count):
+        read_page(document.load_page(page_number), page_number)
+    document.close()
+    close_plumber_documents()
+
+def bench_passes(pdf_path, page_count):
+    """Compare the two-pass fitz + pdfplumber flow with the single-pass page reader."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+            synthetic_table_pdf(pdf_path, page_count)
+        pages = fitz.open(pdf_path).page_count
+        flows = [("single pass", single_pass)]
+        if pdfplumber is not None:
+            flows.insert(0, ("two pass", two_pass))
+        else:
+            print("pdfplumber is not installed; timing the single pass only.")
+        for name, flow in flows:
+            start = time.perf_counter()
+            flow(pdf_path)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>12}: {elapsed:8.2f} s for {pages} pages ({pages / elapsed:7.1f} pages/s)")
+
+def legacy_extract_images(page, output_dir, page_number):
+    """The original flow: write every tile, reopen the files, stack them and delete the tiles.
+
+    Returns the number of files written.
+    """
+    paths = []
+    for img_index, img in enumerate(page.get_images(full=True)):
+        base_image = page.parent.extract_image(img[0])
+        path = os.path.join(output_dir, f"page_{page_number + 1}_image_{img_index + 1}.{base_image['ext']}")
+        with open(path, "wb") as image_file:
+            image_file.write(base_image["image"])
+        paths.append(path)
+    if len(paths) < 2:
+        return len(paths)
+    tiles = [Image.open(path) for path in paths]
+    combined = Image.new('RGB', (max(t.width for t in tiles), sum(t.height for t in tiles)))
+    y_offset = 0
+    for tile in tiles:
+        combined.paste(tile, (0, y_offset))
+        y_offset += tile.height
+        tile.close()
+    combined.save(os.path.join(output_dir, f"page_{page_number + 1}_combined_image.jpg"))
+    for path in paths:
+        os.remove(path)
+    return len(paths) + 1
+
+def in_memory_extract_images(page, output_dir, page_number):
+    """The current flow in version_3: composite in memory and write only the final images."""
+    return len(version_3.extract_images_from_page(page, output_dir, page_number))
+
+def bench_images(pdf_path, page_count):
+    """Compare files written and wall time of the legacy and in-memory image compositing."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp_dir, "tiles.pdf")
+            synthetic_tiled_image_pdf(pdf_path, page_count)
+        for name, flow in (("legacy", legacy_extract_images), ("in memory", in_memory_extract_images)):
+            output_dir = os.path.join(tmp_dir, name.replace(" ", "_"))
+            os.makedirs(output_dir)
+            document = fitz.open(pdf_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                files_written = sum(flow(document.load_page(n), output_dir, n) for n in range(document.page_count))
+                wait_outputs()
+                elapsed = time.perf_counter() - start
+            print(f"{name:>10}: {files_written:6} files written, {elapsed:8.2f} s for {document.page_count} pages")
+            document.close()
+
+def synthetic_drawings(path_count, seed=0):
+    """Build page.get_drawings()-style items like our table pages: ruled cells, fills and a few curves."""
+    rng = random.Random(seed)
+    drawings = []
+    for index in range(path_count):
+        x, y = rng.uniform(30, 500), rng.uniform(60, 780)
+        w, h = rng.uniform(20, 90), rng.uniform(10, 20)
+        if index % 10 == 0:
+            items = [('re', fitz.Rect(x, y, x + w, y + h), 1)]
+            drawings.append({'items': items, 'type': 'f', 'fill': (0.9, 0.9, 0.9), 'color': None, 'width': None})
+            continue
+        items = [('l', fitz.Point(x, y), fitz.Point(x + w, y)),
+                 ('l', fitz.Point(x + w, y), fitz.Point(x + w, y + h)),
+                 ('l', fitz.Point(x + w, y + h), fitz.Point(x, y + h)),
+                 ('l', fitz.Point(x, y + h), fitz.Point(x, y))]
+        if index % 7 == 0:
+            items.append(('c', fitz.Point(x, y), fitz.Point(x + 3, y + 5), fitz.Point(x + 7, y + 5), fitz.Point(x + 10, y)))
+        width = 1.5 if index % 5 == 0 else 0.5
+        drawings.append({'items': items, 'type': 'f', 'fill': None, 'color': (0, 0, 0), 'width': width})
+    return drawings
+
+def legacy_svg(drawings, svg_filename, page_width, page_height):
+    """The original serializer: one <path> per drawing, full-precision floats, one joined string."""
+    svg_content = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{page_width}" height="{page_height}" viewBox="0 0 {page_width} {page_height}">']
+    for item in drawings:
+        path_data = []
+        for shape in item['items']:
+            if shape[0] == 'l':
+                path_data.append(f"M{shape[1].x} {page_height - shape[1].y} L{shape[2].x} {page_height - shape[2].y}")
+            elif shape[0] == 'c':
+                points = shape[1:5]
+                path_data.append(
+                    f"M{points[0].x} {page_height - points[0].y} "
+                    f"C{points[1].x} {page_height - points[1].y}, "
+                    f"{points[2].x} {page_height - points[2].y}, "
+                    f"{points[3].x} {page_height - points[3].y}"
+                )
+            elif shape[0] == 're':
+                rect = shape[1]
+                fill = item.get('fill') or (0, 0, 0)
+                svg_content.append(
+                    f'<rect x="{rect.x0}" y="{page_height - rect.y0 - rect.height}" width="{rect.width}" height="{rect.height}" '
+                    f'fill="rgb({fill[0] * 255}, {fill[1] * 255}, {fill[2] * 255})" fill-opacity="1.0" />'
+                )
+        if path_data:
+            svg_content.append(f'<path d="{" ".join(path_data)}" stroke="black" fill="none" />')
+    svg_content.append('</svg>')
+    with open(svg_filename, 'w') as svg_file:
+        svg_file.write("\n".join(svg_content))
+
+def new_svg(drawings, svg_filename, page_width, page_height, precision=2, relative=True, compress=False):
+    """The SvgWriter path used by the scripts, timed until the file is written.
+
+    Like legacy_svg, this stops once the bytes are handed to the OS; the
+    fsync of a drain is left out of both.
+    """
+    writer = SvgWriter(page_width, page_height, precision, relative)
+    for item in drawings:
+        add_drawing(writer, item)
+    writer.write(svg_filename, compress)
+    wait_outputs()
+
+def bench_svg(path_counts, pages, precision):
+    """Compare size and time of the legacy serializer and SvgWriter on pages of 150-200 drawings."""
+    flows = [
+        ("legacy", ".svg", legacy_svg),
+        (f"writer p={precision}", ".svg", lambda d, f, w, h: new_svg(d, f, w, h, precision)),
+        (f"writer p={precision} abs", ".svg", lambda d, f, w, h: new_svg(d, f, w, h, precision, relative=False)),
+        (f"writer p={precision} svgz", ".svgz", lambda d, f, w, h: new_svg(d, f, w, h, precision, compress=True)),
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for path_count in path_counts:
+            page_drawings = [synthetic_drawings(path_count, seed) for seed in range(pages)]
+            print(f"{pages} pages of {path_count} drawings:")
+            for name, suffix, flow in flows:
+                filename = os.path.join(tmp_dir, "page" + suffix)
+                size = 0
+                start = time.perf_counter()
+                for drawings in page_drawings:
+                    flow(drawings, filename, 595, 842)
+                    size += os.path.getsize(filename)
+                elapsed = time.perf_counter() - start
+                print(f"  {name:>20}: {size / pages / 1024:8.1f} KiB/page, {elapsed / pages * 1000:7.2f} ms/page")
+
+def bench_classify(path_counts, pages):
+    """Time building the page arrays and labelling the drawings of version_1 on synthetic pages."""
+    print(f"{'drawings':>10} {'segments':>10} {'arrays ms':>10} {'label ms':>10} {'us/segment':>11}")
+    for path_count in path_counts:
+        page_drawings = [synthetic_drawings(path_count, seed) for seed in range(pages)]
+        segments = 0
+        build = label = 0.0
+        for drawings in page_drawings:
+            start = time.perf_counter()
+            segments += len(PageGeometry(drawings).lines)
+            build += time.perf_counter() - start
+            start = time.perf_counter()
+            version_1.label_drawings(drawings, 595, 842)
+            label += time.perf_counter() - start
+        print(f"{path_count:>10} {segments // pages:>10} {build / pages * 1000:>10.2f} {label / pages * 1000:>10.2f} "
+              f"{label / segments * 1e6:>11.2f}")
+
+def bench_stitch(page_counts, repeat=5):
+    """Stitch tables running over page breaks by column positions, against the column count alone.
+
+    The tables of each synthetic PDF are detected once; only the stitching
+    is timed, per page break. The count-only rule is the same stitcher with
+    the column positions left out.
+    """
+    print(f"{'pages':>6} {'detect ms/page':>14} {'rule':>8} {'tables':>13} {'rows':>13} {'us/boundary':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for page_count in page_counts:
+            pdf_path = os.path.join(tmp_dir, f"spanning_{page_count}.pdf")
+            expected_tables, expected_rows = synthetic_spanning_table_pdf(pdf_path, page_count)
+            document = fitz.open(pdf_path)
+            start = time.perf_counter()
+            page_tables = [(page_number,) + tuple(find_page_tables(document.load_page(page_number), page_number))
+                           for page_number in range(page_count)]
+            detect = time.perf_counter() - start
+            document.close()
+
+            count_only = [(page_number, tables, [None] * len(tables)) for page_number, tables, _ in page_tables]
+            for rule, results in (("columns", page_tables), ("count", count_only)):
+                best = float("inf")
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    pieces = list(version_2.merge_continuations(version_2.iter_page_tables(results)))
+                    best = min(best, time.perf_counter() - start)
+                tables = sum(starts_new_table for starts_new_table, _ in pieces)
+                rows = sum(len(table_rows) for _, table_rows in pieces)
+                print(f"{page_count:>6} {detect / page_count * 1000:>14.1f} {rule:>8} "
+                      f"{f'{tables}/{expected_tables}':>13} {f'{rows}/{expected_rows}':>13} "
+                      f"{best / max(1, page_count - 1) * 1e6:>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the PDF extraction scripts.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    grid = subparsers.add_parser("grid", help="table grid detection on synthetic line pages")
+    grid.add_argument("--sizes", type=int, nargs="+", default=[10000, 30000, 100000])
+    grid.add_argument("--repeat", type=int, default=3)
+
+    passes = subparsers.add_parser("passes", help="two-pass fitz + pdfplumber flow against the single-pass reader")
+    passes.add_argument("--pdf", help="PDF to time; a synthetic one is generated when omitted")
+    passes.add_argument("--pages", type=int, default=300, help="page count of the synthetic PDF")
+
+    images = subparsers.add_parser("images", help="legacy write-reopen-delete compositing against in-memory compositing")
+    images.add_argument("--pdf", help="PDF to time; a synthetic tiled-image one is generated when omitted")
+    images.add_argument("--pages", type=int, default=50, help="page count of the synthetic PDF")
+
+    svg = subparsers.add_parser("svg", help="legacy SVG serializer against SvgWriter")
+    svg.add_argument("--paths", type=int, nargs="+", default=[150, 200], help="drawings per page")
+    svg.add_argument("--pages", type=int, default=200)
+    svg.add_argument("--precision", type=int, default=2)
+
+    classify = subparsers.add_parser("classify", help="drawing classification of version_1 on synthetic pages")
+    classify.add_argument("--paths", type=int, nargs="+", default=[200, 2000, 20000], help="drawings per page")
+    classify.add_argument("--pages", type=int, default=5)
+
+    stitch = subparsers.add_parser("stitch", help="stitching tables over page breaks by column positions")
+    stitch.add_argument("--pages", type=int, nargs="+", default=[100, 500], help="page counts of the synthetic PDFs")
+    stitch.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.benchmark == "grid":
+        bench_grid(args.sizes, args.repeat)
+    elif args.benchmark == "passes":
+        bench_passes(args.pdf, args.pages)
+    elif args.benchmark == "images":
+        bench_images(args.pdf, args.pages)
+    elif args.benchmark == "svg":
+        bench_svg(args.paths, args.pages, args.precision)
+    elif args.benchmark == "classify":
+        bench_classify(args.paths, args.pages)
+    elif args.benchmark == "stitch":
+        bench_stitch(args.pages, args.repeat)
+
+if __name__ == "__main__":
+    main()
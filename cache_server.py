@@ -0,0 +1,313 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import fitz  # PyMuPDF
+
+from page_bands import body_clip, detect_bands
+from page_data import find_page_tables
+import version_1
+import version_2
+import version_3
+
+# Local extraction service: the libraries are imported and each PDF opened
+# once, and per-page artifacts are kept in a size-bounded LRU, so repeated
+# queries on the same documents skip the parsing.
+
+DEFAULT_PORT = 8765
+
+# Artifact name -> (content type, whether it exists for a whole document)
+ARTIFACTS = {
+    "text": ("text/plain; charset=utf-8", True),  # version_3 content.txt text, header and footer left out
+    "tables": ("text/csv; charset=utf-8", True),  # version_2 table CSV; for a document, continued tables merged
+    "svg": ("image/svg+xml", False),  # version_3 vector SVG
+    "wireframe": ("image/svg+xml", False),  # version_1 table wireframe SVG
+}
+
+class ArtifactCache:
+    """LRU of rendered artifacts keyed by (file hash, page, artifact), bounded by their total size in bytes.
+
+    A missing artifact (a page without tables, say) is cached as None and
+    counts 0 bytes. Values bigger than `max_bytes` are returned but not kept.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> bytes or None
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "render_seconds": 0.0}
+
+    def get(self, key, render):
+        """Return the cached value for `key`, calling render() and caching its result on a miss."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return self.entries[key]
+        self.stats["misses"] += 1
+        start = time.perf_counter()
+        value = render()
+        self.stats["render_seconds"] += time.perf_counter() - start
+        size = len(value) if value is not None else 0
+        if size <= self.max_bytes:
+            self.entries[key] = value
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted) if evicted is not None else 0
+                self.stats["evictions"] += 1
+        return value
+
+    def metrics(self):
+        requests = self.stats["hits"] + self.stats["misses"]
+        return dict(self.stats, entries=len(self.entries), bytes=self.bytes, max_bytes=self.max_bytes,
+                    hit_rate=round(self.stats["hits"] / requests, 4) if requests else 0.0)
+
+def page_artifact(page, artifact, bands):
+    """Render one artifact of a page as bytes, or None when the page has nothing of that kind.
+
+    Tables are kept as JSON rows and column boundaries, so that whole
+    documents can be stitched like version_2 does; get() turns them into CSV.
+    """
+    if artifact == "text":
+        clip = body_clip(bands, page.rect)
+        return version_3.clean_text(page.get_text("text", clip=clip, sort=True)).encode("utf-8")
+    if artifact == "tables":
+        tables, columns = find_page_tables(page, page.number)
+        found = [(table, edges) for table, edges in zip(tables, columns) if table]
+        if not found:
+            return None
+        found = {"tables": [table for table, _ in found], "columns": [edges for _, edges in found]}
+        return json.dumps(found).encode("utf-8")
+    if artifact == "svg":
+        writer, path_count, element_count = version_3.build_svg(page.get_drawings(), page.rect.width, page.rect.height)
+        return writer.to_string().encode("utf-8") if path_count >= 5 and element_count >= 3 else None
+    if artifact == "wireframe":
+        graphics_data = page.get_drawings()
+        _, table_elements = version_1.classify_elements(graphics_data, page.rect.width, page.rect.height,
+                                                        body_clip(bands, page.rect))
+        writer = version_1.build_svg(table_elements, page.rect.width, page.rect.height)
+        return writer.to_string().encode("utf-8") if not writer.is_empty() else None
+    raise ValueError(f"unknown artifact {artifact!r}")
+
+def tables_csv(pieces):
+    """Write (starts_new_table, rows) pieces as CSV bytes, with a blank line between tables."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    table_count = 0
+    for starts_new_table, rows in pieces:
+        if starts_new_table:
+            if table_count:
+                writer.writerow([])
+            table_count += 1
+        writer.writerows(version_2.clean_row(row) for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+class ExtractionService:
+    """Answer artifact requests for PDFs on this machine from the cache, parsing pages only on a miss.
+
+    Files are identified by a SHA-256 of their contents, recomputed only
+    when their size or modification time changes, so an edited PDF never
+    gets stale results. Up to `max_documents` PDFs stay open.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_documents=8):
+        self.cache = ArtifactCache(max_bytes)
+        self.max_documents = max_documents
+        self.hashes = {}  # absolute path -> ((size, mtime), hash)
+        self.documents = OrderedDict()  # hash -> open fitz document
+        self.bands = {}  # hash -> header and footer bands
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        known = self.hashes.get(path)
+        if known is not None and known[0] == signature:
+            return known[1]
+        digest = hashlib.sha256()
+        with open(path, "rb") as pdf_file:
+            for block in iter(lambda: pdf_file.read(1 << 20), b""):
+                digest.update(block)
+        self.hashes[path] = (signature, digest.hexdigest())
+        return self.hashes[path][1]
+
+    def document(self, path, file_hash):
+        """Return the open document for a file hash, opening it (and closing the oldest) when needed."""
+        document = self.documents.get(file_hash)
+        if document is not None:
+            self.documents.move_to_end(file_hash)
+            return document
+        document = self.documents[file_hash] = fitz.open(path)
+        if file_hash not in self.bands:
+            self.bands[file_hash] = detect_bands(path)
+        while len(self.documents) > self.max_documents:
+            _, oldest = self.documents.popitem(last=False)
+            oldest.close()
+        return document
+
+    def get(self, path, artifact, page_number=None):
+        """Return (bytes or None, content type) for one artifact of one page, or of the whole document.
+
+        `page_number` counts from 0; None asks for the whole document, which
+        only the text and tables artifacts support.
+        """
+        path = os.path.abspath(path)
+        content_type, whole_document = ARTIFACTS[artifact]
+        file_hash = self.file_hash(path)
+        document = self.document(path, file_hash)
+        if page_number is None:
+            if not whole_document:
+                raise ValueError(f"the {artifact} artifact needs a page")
+            value = self.cache.get((file_hash, None, artifact), lambda: self.document_artifact(path, artifact))
+            return value, content_type
+        if not 0 <= page_number < document.page_count:
+            raise ValueError(f"page {page_number + 1} is out of range (1-{document.page_count})")
+        value = self.page_value(file_hash, document, page_number, artifact)
+        if artifact == "tables" and value is not None:
+            value = tables_csv((True, table) for table in json.loads(value)["tables"])
+        return value, content_type
+
+    def page_value(self, file_hash, document, page_number, artifact):
+        """Return the cached artifact of one page, rendering it on a miss."""
+        bands = self.bands[file_hash]
+        return self.cache.get((file_hash, page_number, artifact),
+                              lambda: page_artifact(document.load_page(page_number), artifact, bands))
+
+    def document_artifact(self, path, artifact):
+        """Assemble a whole-document artifact from the cached page artifacts."""
+        file_hash = self.file_hash(path)
+        document = self.document(path, file_hash)
+        pages = [self.page_value(file_hash, document, number, artifact) for number in range(document.page_count)]
+        if artifact == "text":
+            return b"\n\n".join(page or b"" for page in pages)
+        # Tables: merge tables continued over page breaks, as version_2 does
+        page_tables = []
+        for page_number, page in enumerate(pages):
+            if page:
+                found = json.loads(page)
+                page_tables += [(page_number, table, edges) for table, edges in zip(found["tables"], found["columns"])]
+        return tables_csv(version_2.merge_continuations(page_tables)) if page_tables else None
+
+    def metrics(self):
+        return dict(self.cache.metrics(), documents_open=len(self.documents), files_hashed=len(self.hashes))
+
+    def close(self):
+        for document in self.documents.values():
+            document.close()
+        self.documents.clear()
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """GET /artifact?path=PDF&artifact=NAME[&page=N] (pages count from 1) and GET /metrics."""
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        service = self.server.service
+        if url.path == "/metrics":
+            return self.reply(200, json.dumps(service.metrics()).encode("utf-8"), "application/json")
+        if url.path != "/artifact":
+            return self.reply(404, b"unknown endpoint\n", "text/plain")
+        try:
+            path = query["path"][0]
+            artifact = query.get("artifact", ["text"])[0]
+            if artifact not in ARTIFACTS:
+                raise ValueError(f"artifact must be one of {', '.join(ARTIFACTS)}")
+            page_number = int(query["page"][0]) - 1 if "page" in query else None
+            value, content_type = service.get(path, artifact, page_number)
+        except (KeyError, ValueError, OSError, RuntimeError) as e:
+            return self.reply(400, f"{type(e).__name__}: {e}\n".encode("utf-8"), "text/plain")
+        if value is None:
+            return self.reply(404, f"no {artifact} found\n".encode("utf-8"), "text/plain")
+        self.reply(200, value, content_type)
+
+    def reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(port=DEFAULT_PORT, max_bytes=256 * 1024 * 1024, max_documents=8):
+    """Serve artifacts on localhost until interrupted.
+
+    Requests are handled one at a time: MuPDF documents must not be used
+    from several threads at once, and cached requests take microseconds.
+    """
+    server = HTTPServer(("127.0.0.1", port), RequestHandler)
+    server.service = ExtractionService(max_bytes, max_documents)
+    print(f"Serving extraction artifacts on http://127.0.0.1:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+
+def fetch(pdf_path, artifact="text", page=None, port=DEFAULT_PORT):
+    """Client: return the bytes of an artifact from a running service, or None when there is none.
+
+    `page` counts from 1, like the output file names; None asks for the
+    whole document. Raises ValueError with the service's message on a bad
+    request.
+    """
+    query = {"path": os.path.abspath(pdf_path), "artifact": artifact}
+    if page is not None:
+        query["page"] = page
+    url = f"http://127.0.0.1:{port}/artifact?{urllib.parse.urlencode(query)}"
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise ValueError(e.read().decode("utf-8", "replace").strip()) from None
+
+def fetch_metrics(port=DEFAULT_PORT):
+    """Client: return the service's cache metrics."""
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        return json.load(response)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local extraction service with a per-page artifact cache.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the service")
+    serve_parser.add_argument("--max-mb", type=float, default=256, help="cache size in MiB (default: 256)")
+    serve_parser.add_argument("--max-documents", type=int, default=8, help="PDFs kept open (default: 8)")
+    get_parser = commands.add_parser("get", help="fetch one artifact from a running service")
+    get_parser.add_argument("pdf")
+    get_parser.add_argument("artifact", choices=sorted(ARTIFACTS))
+    get_parser.add_argument("--page", type=int, default=None, help="page number from 1 (default: whole document)")
+    get_parser.add_argument("-o", "--output", help="write to this file instead of standard output")
+    commands.add_parser("metrics", help="print the cache metrics of a running service")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port, int(args.max_mb * 1024 * 1024), args.max_documents)
+    elif args.command == "metrics":
+        print(json.dumps(fetch_metrics(args.port), indent=1))
+    else:
+        try:
+            data = fetch(args.pdf, args.artifact, args.page, args.port)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        if data is None:
+            raise SystemExit(f"No {args.artifact} found.")
+        if args.output:
+            with open(args.output, "wb") as output_file:
+                output_file.write(data)
+        else:
+            sys.stdout.buffer.write(data)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import glob
+import importlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import profiling
+
+# Extraction flows the command line can run, by script name
+SCRIPTS = {
+    "1": "version_1",  # Vector and table wireframe SVGs
+    "2": "version_2",  # Images, vector SVGs and combined table CSV
+    "3": "version_3",  # Combined images, vector SVGs and content.txt
+}
+
+def find_pdfs(inputs):
+    """Expand files, glob patterns and directories (searched recursively) into a list of PDF paths."""
+    pdf_paths = []
+    seen = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            matches = sorted(glob.glob(os.path.join(entry, "**", "*"), recursive=True))
+            matches = [path for path in matches if path.lower().endswith(".pdf")]
+        elif glob.has_magic(entry):
+            matches = sorted(glob.glob(entry, recursive=True))
+        else:
+            matches = [entry]
+        for path in matches:
+            key = os.path.abspath(path)
+            if os.path.isfile(path) and key not in seen:
+                seen.add(key)
+                pdf_paths.append(path)
+            elif not os.path.exists(path):
+                print(f"Skipping '{path}': no such file.")
+    return pdf_paths
+
+def output_dirs_for(pdf_paths, output_root):
+    """Give every document its own output subdirectory named after the file."""
+    dirs = []
+    used = set()
+    for pdf_path in pdf_paths:
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        name, suffix = stem, 2
+        while name in used:
+            name = f"{stem}_{suffix}"
+            suffix += 1
+        used.add(name)
+        dirs.append(os.path.join(output_root, name))
+    return dirs
+
+def process_pdf(script, pdf_path, output_dir, page_workers, incremental, profile_settings=None, low_memory=False,
+                sidecar=False):
+    """Worker entry point: run one extraction flow on one document.
+
+    Returns (pages processed, seconds, error message or None, profiling
+    measurements). The script is imported once per worker process and reused
+    for every document it handles. `sidecar` is passed on only when set, as
+    only version_3 writes one.
+    """
+    profiling.configure(profile_settings)
+    profiling.set_document(pdf_path)
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(SCRIPTS[script])
+        options = {"sidecar": True} if sidecar else {}
+        with profiling.capture(os.path.splitext(os.path.basename(pdf_path))[0]):
+            pages = module.process_document(pdf_path, output_dir, workers=page_workers, incremental=incremental,
+                                            low_memory=low_memory, **options)
+        return pages, time.perf_counter() - start, None, profiling.collect()
+    except Exception as e:
+        return 0, time.perf_counter() - start, f"{type(e).__name__}: {e}", profiling.collect()
+
+def run_batch(pdf_paths, output_root, script="3", jobs=None, page_workers=1, incremental=False, low_memory=False,
+              sidecar=False):
+    """Process documents concurrently through a bounded process pool and print a throughput summary.
+
+    At most `jobs` documents run at once and at most twice that many are
+    queued, so huge directory listings do not pile up in the pool. A
+    document whose worker dies (a crash or the OOM killer) breaks the pool:
+    the documents in that pool are recorded as failed and the rest of the
+    batch runs in a new pool. Returns the list of documents that failed.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    profile_settings = profiling.settings()
+    output_dirs = output_dirs_for(pdf_paths, output_root)
+    work = iter(zip(pdf_paths, output_dirs))
+    total_pages = 0
+    failures = []
+    start = time.perf_counter()
+
+    pool = ProcessPoolExecutor(max_workers=jobs)
+    pending = {}  # future -> (pdf_path, pool it runs in)
+
+    def submit_next():
+        nonlocal pool
+        item = next(work, None)
+        if item is None:
+            return
+        pdf_path, output_dir = item
+        args = (process_pdf, script, pdf_path, output_dir, page_workers, incremental, profile_settings, low_memory,
+                sidecar)
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=jobs)
+            future = pool.submit(*args)
+        pending[future] = (pdf_path, pool)
+
+    try:
+        for _ in range(jobs * 2):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf_path, owner = pending.pop(future)
+                try:
+                    pages, seconds, error, records = future.result()
+                    profiling.merge(records)
+                except BrokenProcessPool:
+                    pages, seconds, error = 0, 0.0, "its worker pool broke (a worker process died)"
+                    if owner is pool:
+                        pool.shutdown(wait=False)
+                        pool = ProcessPoolExecutor(max_workers=jobs)
+                except Exception as e:
+                    pages, seconds, error = 0, 0.0, f"{type(e).__name__}: {e}"
+                if error:
+                    failures.append(pdf_path)
+                    print(f"FAILED {pdf_path}: {error}")
+                else:
+                    total_pages += pages
+                    print(f"Done {pdf_path}: {pages} pages in {seconds:.2f} s")
+                submit_next()
+    finally:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    documents = len(pdf_paths) - len(failures)
+    print(f"Processed {documents} documents ({total_pages} pages) in {elapsed:.2f} s: "
+          f"{total_pages / elapsed if elapsed else 0:.1f} pages/s, "
+          f"{documents / elapsed * 60 if elapsed else 0:.1f} documents/min"
+          + (f", {len(failures)} failed" if failures else ""))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract SVGs, images, tables and text from PDF files.")
+    parser.add_argument("inputs", nargs="+", help="PDF files, glob patterns or directories")
+    parser.add_argument("-o", "--output-dir", required=True, help="root directory; each PDF gets its own subdirectory")
+    parser.add_argument("-s", "--script", choices=sorted(SCRIPTS), default="3", help="extraction flow to run (default: 3)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="documents processed at once (default: CPU count)")
+    parser.add_argument("--page-workers", type=int, default=1, help="page worker processes per document (default: 1)")
+    parser.add_argument("--incremental", action="store_true", help="skip pages unchanged since the last run")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="release page resources eagerly and cap retained state, for documents of thousands of pages")
+    parser.add_argument("--sidecar", action="store_true",
+                        help="also write content_index.parquet (or .json without pyarrow) indexing text blocks, "
+                             "table cells, images and vector groups (script 3 only)")
+    parser.add_argument("--profile-report", metavar="PATH",
+                        help="write per-page, per-stage timings, counters and peak memory as JSON (or CSV for a .csv path)")
+    parser.add_argument("--cprofile", metavar="PREFIX",
+                        help="capture cProfile stats; each process dumps PREFIX.<pid>.<document or pages>")
+    args = parser.parse_args()
+
+    pdf_paths = find_pdfs(args.inputs)
+    if not pdf_paths:
+        parser.error("no PDF files found")
+    if args.sidecar and args.script != "3":
+        parser.error("--sidecar is only supported by script 3")
+    if args.profile_report or args.cprofile:
+        profiling.enable(args.cprofile)
+    failures = run_batch(pdf_paths, args.output_dir, args.script, args.jobs, args.page_workers, args.incremental,
+                         args.low_memory, args.sidecar)
+    if args.profile_report:
+        profiling.write_report(args.profile_report)
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import numpy as np
+
+class PageGeometry:
+    """The line, rectangle and curve items of one page's drawings as flat NumPy arrays.
+
+    Built once per page from page.get_drawings() so that classification runs
+    as array operations instead of walking fitz.Point objects:
+
+    - `lines`, `rects`: (n, 4) float64 arrays of x0, y0, x1, y1 (curves keep
+      their two end points in `curves`), 32 bytes per item.
+    - `line_drawing`, `rect_drawing`, `curve_drawing`: index of the drawing
+      each item belongs to.
+    - `widths`: stroke width per drawing (0 when unset), `item_counts`:
+      number of items per drawing, of any kind.
+    """
+
+    def __init__(self, graphics_data):
+        line_coords, line_drawing = [], []
+        rect_coords, rect_drawing = [], []
+        curve_coords, curve_drawing = [], []
+        widths, item_counts = [], []
+        for index, item in enumerate(graphics_data):
+            shapes = item.get('items') or ()
+            for shape in shapes:
+                kind = shape[0]
+                if kind == 'l':
+                    line_coords += (shape[1].x, shape[1].y, shape[2].x, shape[2].y)
+                    line_drawing.append(index)
+                elif kind == 're':
+                    rect = shape[1]
+                    rect_coords += (rect.x0, rect.y0, rect.x1, rect.y1)
+                    rect_drawing.append(index)
+                elif kind == 'c':
+                    curve_coords += (shape[1].x, shape[1].y, shape[4].x, shape[4].y)
+                    curve_drawing.append(index)
+            widths.append(item.get('width') or 0)
+            item_counts.append(len(shapes))
+
+        self.lines = np.array(line_coords, dtype=np.float64).reshape(-1, 4)
+        self.line_drawing = np.array(line_drawing, dtype=np.intp)
+        self.rects = np.array(rect_coords, dtype=np.float64).reshape(-1, 4)
+        self.rect_drawing = np.array(rect_drawing, dtype=np.intp)
+        self.curves = np.array(curve_coords, dtype=np.float64).reshape(-1, 4)
+        self.curve_drawing = np.array(curve_drawing, dtype=np.intp)
+        self.widths = np.array(widths, dtype=np.float64)
+        self.item_counts = np.array(item_counts, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.item_counts)
+
+    def count_per_drawing(self, drawing, mask=None):
+        """Count the items of each drawing, optionally only those where `mask` is set."""
+        if mask is not None:
+            drawing = drawing[mask]
+        return np.bincount(drawing, minlength=len(self))
+
+def split_lines(lines, tolerance=2):
+    """Split (n, 4) line segments into horizontal and vertical rules.
+
+    Each result is an (m, 3) array of (position, start, end) rows sorted by
+    position then start, ready for a collinear merge.
+    """
+    x0, y0, x1, y1 = lines.T
+    horizontal_mask = np.abs(y0 - y1) < tolerance
+    vertical_mask = ~horizontal_mask & (np.abs(x0 - x1) < tolerance)
+    horizontal = np.column_stack(((y0 + y1) / 2, np.minimum(x0, x1), np.maximum(x0, x1)))[horizontal_mask]
+    vertical = np.column_stack(((x0 + x1) / 2, np.minimum(y0, y1), np.maximum(y0, y1)))[vertical_mask]
+    return (horizontal[np.lexsort((horizontal[:, 2], horizontal[:, 1], horizontal[:, 0]))],
+            vertical[np.lexsort((vertical[:, 2], vertical[:, 1], vertical[:, 0]))])
+
+def boxes_in_rects(boxes, rects, closed=True):
+    """Check for each (n, 4) box whether one of the rectangles contains it.
+
+    With `closed` False a box reaching a rectangle's right or bottom edge is
+    outside it. The rectangles' top and bottom edges cut the page into
+    horizontal slabs; each box is looked up by bisection among the
+    rectangles spanning its slab, sorted by x0, and only compared with the
+    nearest one to its left, or with earlier ones that reach further right
+    when rectangles overlap. Runs in O((n + p) log(n + p)) for n boxes and p
+    (slab, rectangle) pairs, about one per table for tables side by side.
+    """
+    inside = np.zeros(len(boxes), dtype=bool)
+    if not len(rects) or not len(boxes):
+        return inside
+    rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+    edges = np.unique(rects[:, [1, 3]])
+    first = np.searchsorted(edges, rects[:, 1])
+    # A closed rectangle also spans the slab starting at its bottom edge
+    spans = np.maximum(np.searchsorted(edges, rects[:, 3]) - first + (1 if closed else 0), 0)
+    member = np.repeat(np.arange(len(rects)), spans)
+    slab = np.repeat(first - np.cumsum(spans) + spans, spans) + np.arange(len(member))
+    order = np.lexsort((rects[member, 0], slab))
+    member, slab = member[order], slab[order]
+
+    # Furthest right edge of the rectangles so far in each slab
+    reach = rects[member, 2]
+    starts = np.flatnonzero(np.diff(slab, prepend=-1))
+    for begin, end in zip(starts, np.append(starts[1:], len(slab))):
+        np.maximum.accumulate(reach[begin:end], out=reach[begin:end])
+
+    # Rank x0 so that (slab, x0) pairs sort as one integer key
+    lefts = np.unique(rects[:, 0])
+    key = slab * (len(lefts) + 1) + np.searchsorted(lefts, rects[member, 0], side='right')
+    box_slab = np.searchsorted(edges, boxes[:, 1], side='right') - 1
+    box_key = box_slab * (len(lefts) + 1) + np.searchsorted(lefts, boxes[:, 0], side='right')
+    candidate = np.searchsorted(key, box_key, side='right') - 1
+
+    pending = np.flatnonzero((candidate >= 0) & (slab[np.maximum(candidate, 0)] == box_slab))
+    while len(pending):
+        index = candidate[pending]
+        right, bottom = rects[member[index], 2], rects[member[index], 3]
+        x1, y1 = boxes[pending, 2], boxes[pending, 3]
+        fits = (x1 <= right) & (y1 <= bottom) if closed else (x1 < right) & (y1 < bottom)
+        inside[pending[fits]] = True
+        # Step left while an earlier rectangle of the slab still reaches past the box
+        pending, index = pending[~fits], index[~fits] - 1
+        previous = np.maximum(index, 0)
+        reaches = reach[previous] >= boxes[pending, 2] if closed else reach[previous] > boxes[pending, 2]
+        more = (index >= 0) & (slab[previous] == box_slab[pending]) & reaches
+        pending = pending[more]
+        candidate[pending] = index[more]
+    return inside
+
+def segments_in_rects(lines, rects, tolerance=2):
+    """Check for each segment whether both end points fall inside one rectangle grown by the tolerance."""
+    if not len(rects) or not len(lines):
+        return np.zeros(len(lines), dtype=bool)
+    area = np.asarray(rects, dtype=np.float64) + (-tolerance, -tolerance, tolerance, tolerance)
+    boxes = np.column_stack((np.minimum(lines[:, 0], lines[:, 2]), np.minimum(lines[:, 1], lines[:, 3]),
+                             np.maximum(lines[:, 0], lines[:, 2]), np.maximum(lines[:, 1], lines[:, 3])))
+    return boxes_in_rects(boxes, area, closed=False)
+
+def rects_in_rects(inner, outer):
+    """Check for each inner rectangle whether one of the outer rectangles contains it."""
+    return boxes_in_rects(inner, outer)
+
+def header_rules(geometry, page_width, page_height, header_ratio=0.12, min_span=0.5, tolerance=2):
+    """Flag drawings that are a single long horizontal line in the header band of the page."""
+    x0, y0, x1, y1 = geometry.lines.T
+    rule = ((np.abs(y0 - y1) < tolerance)
+            & (np.maximum(y0, y1) < page_height * header_ratio)
+            & (np.abs(x1 - x0) >= page_width * min_span))
+    single_line = (geometry.item_counts == 1) & (geometry.count_per_drawing(geometry.line_drawing) == 1)
+    return single_line & (geometry.count_per_drawing(geometry.line_drawing, rule) == 1)
+
+def outside_body(geometry, body_top, body_bottom):
+    """Flag drawings lying entirely above `body_top` or entirely below `body_bottom`."""
+    tops = np.full(len(geometry), np.inf)
+    bottoms = np.full(len(geometry), -np.inf)
+    for coords, drawing in ((geometry.lines, geometry.line_drawing),
+                            (geometry.rects, geometry.rect_drawing),
+                            (geometry.curves, geometry.curve_drawing)):
+        np.minimum.at(tops, drawing, np.minimum(coords[:, 1], coords[:, 3]))
+        np.maximum.at(bottoms, drawing, np.maximum(coords[:, 1], coords[:, 3]))
+    return (tops <= bottoms) & ((bottoms <= body_top) | (tops >= body_bottom))
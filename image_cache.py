@@ -0,0 +1,134 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from output_sink import wait_outputs, write_output
+import profiling
+
+# Image cache bounds (max images, max bytes), by default and in low-memory mode
+DEFAULT_CACHE_LIMITS = (32, 64 * 1024 * 1024)
+LOW_MEMORY_CACHE_LIMITS = (8, 16 * 1024 * 1024)
+
+class ImageCache:
+    """Document-level cache that decodes and writes each distinct image once.
+
+    Images are looked up by xref first and by a SHA-1 of their bytes second, so
+    a logo embedded under several xrefs is still written once. Extracted images
+    are kept in an LRU bounded by `max_items` and `max_bytes` so that pages
+    compositing the same tiles do not extract them again.
+    """
+
+    def __init__(self, max_items=DEFAULT_CACHE_LIMITS[0], max_bytes=DEFAULT_CACHE_LIMITS[1]):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.extracted = OrderedDict()  # xref -> extract_image() result
+        self.extracted_bytes = 0
+        self.files_by_xref = {}
+        self.files_by_digest = {}
+        self.digests = {}  # file name -> digest, for every file this cache wrote
+        self.hits = 0
+        self.misses = 0
+
+    def extract_image(self, document, xref):
+        """Return document.extract_image(xref), served from the LRU when possible."""
+        base_image = self.extracted.get(xref)
+        if base_image is not None:
+            self.extracted.move_to_end(xref)
+            return base_image
+        with profiling.stage("extract_image"):
+            base_image = document.extract_image(xref)
+        profiling.count("images_extracted")
+        size = len(base_image["image"])
+        if self.max_items > 0 and size <= self.max_bytes:
+            self.extracted[xref] = base_image
+            self.extracted_bytes += size
+            while len(self.extracted) > self.max_items or self.extracted_bytes > self.max_bytes:
+                _, evicted = self.extracted.popitem(last=False)
+                self.extracted_bytes -= len(evicted["image"])
+        return base_image
+
+    def write(self, filename, data, xref=None):
+        """Write image bytes unless identical bytes were already written; return the file used."""
+        digest = hashlib.sha1(data).hexdigest()
+        existing = self.files_by_digest.get(digest)
+        if existing is not None:
+            self.hits += 1
+            if xref is not None:
+                self.files_by_xref[xref] = existing
+            return existing
+        self.misses += 1
+        with profiling.stage("image_write"):
+            write_output(filename, data)
+        profiling.count("images_written")
+        self.files_by_digest[digest] = filename
+        self.digests[filename] = digest
+        if xref is not None:
+            self.files_by_xref[xref] = filename
+        return filename
+
+    def save_image(self, document, xref, filename_base):
+        """Write the image behind an xref as `filename_base.<ext>` once per document; return the file used."""
+        existing = self.files_by_xref.get(xref)
+        if existing is not None:
+            self.hits += 1
+            print(f"Reusing image: {existing}")
+            return existing
+        base_image = self.extract_image(document, xref)
+        image_filename = f"{filename_base}.{base_image['ext']}"
+        filename = self.write(image_filename, base_image["image"], xref)
+        if filename == image_filename:
+            print(f"Extracted image: {filename}")
+        else:
+            print(f"Reusing image: {filename}")
+        return filename
+
+# One cache per (document, output directory) in this process, so the pages of
+# every chunk a worker handles share it
+_caches = {}
+
+def get_image_cache(document, output_dir, max_items=DEFAULT_CACHE_LIMITS[0], max_bytes=DEFAULT_CACHE_LIMITS[1]):
+    """Return the process-wide cache for a document and output directory."""
+    key = (document.name, output_dir)
+    if key not in _caches:
+        _caches[key] = ImageCache(max_items, max_bytes)
+    return _caches[key]
+
+def release_image_caches():
+    """Drop all caches held by this process."""
+    _caches.clear()
+
+def dedupe_images(filenames, digests, canonical):
+    """Point repeats at the first file written with the same bytes and delete the extra copies.
+
+    Worker processes each keep their own cache, so two workers can write the
+    same logo. Called in page order with the `digests` reported by the workers
+    and a `canonical` dict (digest -> file) shared across calls, it keeps the
+    copy from the earliest page.
+    """
+    result = []
+    for filename in filenames:
+        digest = digests.get(filename)
+        if digest is None:
+            result.append(filename)
+            continue
+        first = canonical.setdefault(digest, filename)
+        if first != filename:
+            wait_outputs()  # The copy may still be queued in this process
+            if os.path.exists(filename):
+                os.remove(filename)
+                print(f"Removed duplicate image {filename}; using {first}")
+        result.append(first)
+    return result
+
+def fold_images(filenames, digests, canonical):
+    """Fold one page's images onto the earliest copies (see dedupe_images).
+
+    Returns (final file names, digests keyed by final name, files this page
+    actually wrote).
+    """
+    if not filenames:
+        return list(filenames), digests, list(filenames)
+    final = dedupe_images(filenames, digests, canonical)
+    folded = {name: digests[original] for original, name in zip(filenames, final) if original in digests}
+    written = [name for original, name in zip(filenames, final) if original == name]
+    return final, folded, written
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import fitz  # PyMuPDF
+
+from page_pool import map_pages
+
+MANIFEST_NAME = "manifest.json"
+FRAGMENT_DIR = ".fragments"
+MANIFEST_VERSION = 1
+
+def page_fingerprint(page):
+    """Hash a page's content streams and the resources it draws with.
+
+    Image and form XObjects are hashed with their streams; fonts by their
+    object definition only, since font programs are large and rarely change
+    without their dictionary changing too.
+    """
+    document = page.parent
+    digest = hashlib.sha256()
+    digest.update(page.read_contents())
+    digest.update(document.xref_object(page.xref, compressed=True).encode())
+    streams = {img[0] for img in page.get_images(full=True)}
+    streams.update(xobject[0] for xobject in page.get_xobjects())
+    objects = {font[0] for font in page.get_fonts(full=True)}
+    for xref in sorted(streams | objects):
+        if xref <= 0:
+            continue
+        digest.update(document.xref_object(xref, compressed=True).encode())
+        if xref in streams and document.xref_is_stream(xref):
+            digest.update(document.xref_stream_raw(xref))
+    return digest.hexdigest()
+
+def settings_fingerprint(settings):
+    """Hash the extractor settings, so changing any of them invalidates every page."""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+def run_page(page, page_number, page_func, known_fingerprints, *args):
+    """Worker wrapper: skip pages whose fingerprint is unchanged, otherwise run page_func.
+
+    Returns (fingerprint, reused, result). With `known_fingerprints` set to
+    None the page is always processed and no fingerprint is computed.
+    """
+    if known_fingerprints is None:
+        return None, False, page_func(page, page_number, *args)
+    fingerprint = page_fingerprint(page)
+    if known_fingerprints.get(page_number) == fingerprint:
+        print(f"Page {page_number + 1} is unchanged; reusing its previous outputs.")
+        return fingerprint, True, None
+    return fingerprint, False, page_func(page, page_number, *args)
+
+class PageManifest:
+    """Per-page fingerprints, output files and result fragments of earlier runs in an output directory.
+
+    A page can be reused when its fingerprint, the settings and the manifest
+    version all match, and its outputs and fragment are still on disk. The
+    fragment is the page's JSON-serializable result; aggregate files such as
+    content.txt and the combined CSV are rebuilt from the fragments.
+    """
+
+    def __init__(self, output_dir, settings):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.fragment_dir = os.path.join(output_dir, FRAGMENT_DIR)
+        self.settings = settings
+        self.settings_hash = settings_fingerprint(settings)
+        self.pages = {}
+        self.fresh_outputs = set()  # Files written by pages processed in this run
+        if os.path.exists(self.path):
+            with open(self.path) as manifest_file:
+                previous = json.load(manifest_file)
+            if previous.get("version") == MANIFEST_VERSION and previous.get("settings_hash") == self.settings_hash:
+                self.pages = previous.get("pages", {})
+
+    def fragment_path(self, page_number):
+        return os.path.join(self.fragment_dir, f"page_{page_number + 1}.json")
+
+    def reusable_pages(self):
+        """Return {page_number: fingerprint} for pages whose outputs and fragment still exist."""
+        reusable = {}
+        for key, entry in self.pages.items():
+            page_number = int(key)
+            if not os.path.exists(self.fragment_path(page_number)):
+                continue
+            if all(os.path.exists(output) for output in entry["outputs"]):
+                reusable[page_number] = entry["fingerprint"]
+        return reusable
+
+    def load_fragment(self, page_number):
+        with open(self.fragment_path(page_number)) as fragment_file:
+            return json.load(fragment_file)
+
+    def record(self, page_number, fingerprint, outputs, fragment, written=None):
+        """Remember a freshly processed page and save its fragment.
+
+        `written` lists the outputs the page actually wrote in this run
+        (default: all of them); outputs it shares with earlier pages, such
+        as an image folded onto an earlier copy, do not make the unchanged
+        pages that also point at them run again.
+        """
+        os.makedirs(self.fragment_dir, exist_ok=True)
+        with open(self.fragment_path(page_number), "w") as fragment_file:
+            json.dump(fragment, fragment_file)
+        self.pages[str(page_number)] = {"fingerprint": fingerprint, "outputs": sorted(set(outputs))}
+        self.fresh_outputs.update(outputs if written is None else written)
+
+    def save(self):
+        """Write the manifest atomically."""
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "settings_hash": self.settings_hash,
+            "pages": self.pages,
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+def map_pages_incremental(pdf_path, page_numbers, page_func, args=(), workers=None, manifest=None, low_memory=False):
+    """Like map_pages, but yield (page_number, result, fingerprint, reused) and skip unchanged pages.
+
+    An unchanged page's result is its fragment from the previous run. If an
+    earlier page processed in this run rewrote a file the unchanged page
+    points at (for example a shared image), the page is processed again in
+    this process. The caller records fresh pages with manifest.record() as
+    they arrive. Without a manifest every page is processed.
+    """
+    known = manifest.reusable_pages() if manifest is not None else None
+    document = None
+    try:
+        results = map_pages(pdf_path, page_numbers, run_page, (page_func, known) + tuple(args), workers,
+                            low_memory=low_memory)
+        for page_number, (fingerprint, reused, result) in results:
+            if reused:
+                outputs = manifest.pages[str(page_number)]["outputs"]
+                if manifest.fresh_outputs.isdisjoint(outputs):
+                    yield page_number, manifest.load_fragment(page_number), fingerprint, True
+                    continue
+                if document is None:
+                    document = fitz.open(pdf_path)
+                result = page_func(document.load_page(page_number), page_number, *args)
+            yield page_number, result, fingerprint, False
+    finally:
+        if document is not None:
+            document.close()
@@ -0,0 +1,232 @@
+import atexit
+import io
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+import profiling
+
+class SinkStream(io.RawIOBase):
+    """Write end of one streamed file: every write is queued on the sink as a chunk."""
+
+    def __init__(self, sink, filename):
+        super().__init__()
+        self.sink = sink
+        self.token = next(sink.tokens)
+        sink.put(("open", self.token, filename), 0)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.sink.put(("chunk", self.token, data), len(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.sink.put(("close", self.token, None), 0)
+        super().close()
+
+class OutputSink:
+    """Write output files on a background thread so page parsing does not wait for the disk.
+
+    Whole files are queued with write(); files produced piece by piece are
+    streamed through open(), whose small writes are buffered into
+    `chunk_size` pieces. The writer thread takes everything queued at each
+    wake-up as one batch. At most `max_pending_bytes` may wait in the queue;
+    beyond that producers block, and how often and how long they block is
+    kept in `stats`. drain() is the barrier: once it returns, every queued
+    file is written and, when `durable`, fsynced along with its directory.
+    """
+
+    def __init__(self, max_pending_bytes=64 * 1024 * 1024, chunk_size=1 << 16, durable=True):
+        self.max_pending_bytes = max_pending_bytes
+        self.chunk_size = chunk_size
+        self.durable = durable
+        self.queue = deque()  # (kind, target, data, size)
+        self.pending_bytes = 0
+        self.busy = False
+        self.condition = threading.Condition()
+        self.tokens = itertools.count()
+        self.thread = None
+        self.error = None
+        self.directories = set()
+        self.stats = self.new_stats()
+
+    @staticmethod
+    def new_stats():
+        return {"files": 0, "bytes": 0, "batches": 0, "waits": 0, "wait_seconds": 0.0, "peak_pending_bytes": 0}
+
+    def put(self, item, size):
+        """Queue an item, blocking while the queue is over its byte limit."""
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="output-sink", daemon=True)
+                self.thread.start()
+            if self.pending_bytes and self.pending_bytes + size > self.max_pending_bytes:
+                start = time.perf_counter()
+                with profiling.stage("sink_wait"):
+                    while self.pending_bytes and self.pending_bytes + size > self.max_pending_bytes:
+                        self.condition.wait()
+                self.stats["waits"] += 1
+                self.stats["wait_seconds"] += time.perf_counter() - start
+            self.queue.append(item + (size,))
+            self.pending_bytes += size
+            self.stats["peak_pending_bytes"] = max(self.stats["peak_pending_bytes"], self.pending_bytes)
+            self.condition.notify_all()
+
+    def write(self, filename, data):
+        """Queue a whole file; str data is written as UTF-8."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.put(("file", filename, data), len(data))
+
+    def open(self, filename, mode="w", encoding="utf-8", newline=None):
+        """Return a file object whose contents the sink writes; binary when 'b' is in `mode`."""
+        stream = io.BufferedWriter(SinkStream(self, filename), self.chunk_size)
+        if "b" in mode:
+            return stream
+        return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+    def run(self):
+        handles = {}  # stream token -> open file
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                batch = list(self.queue)
+                self.queue.clear()
+                self.busy = True
+            for kind, target, data, size in batch:
+                try:
+                    self.handle(kind, target, data, handles)
+                except Exception as e:
+                    if self.error is None:
+                        self.error = e
+                with self.condition:
+                    self.pending_bytes -= size
+                    self.condition.notify_all()
+            with self.condition:
+                self.stats["batches"] += 1
+                self.busy = False
+                self.condition.notify_all()
+
+    def handle(self, kind, target, data, handles):
+        if kind == "file":
+            with open(target, "wb") as output_file:
+                output_file.write(data)
+                self.finish(output_file)
+            self.directories.add(os.path.dirname(os.path.abspath(target)))
+            self.stats["bytes"] += len(data)
+        elif kind == "open":  # target is the stream token, data its file name
+            handles[target] = open(data, "wb")
+            self.directories.add(os.path.dirname(os.path.abspath(data)))
+        elif kind == "chunk":
+            output_file = handles.get(target)
+            if output_file is not None:
+                output_file.write(data)
+                self.stats["bytes"] += len(data)
+        elif kind == "close":
+            output_file = handles.pop(target, None)
+            if output_file is not None:
+                with output_file:
+                    self.finish(output_file)
+
+    def finish(self, output_file):
+        if self.durable:
+            output_file.flush()
+            os.fsync(output_file.fileno())
+        self.stats["files"] += 1
+
+    def wait(self):
+        """Block until everything queued so far has been written."""
+        with self.condition:
+            while self.queue or self.busy:
+                self.condition.wait()
+
+    def drain(self):
+        """Barrier: wait for all writes, make them durable and return the stats since the last drain.
+
+        Raises the first error any write hit.
+        """
+        self.wait()
+        with self.condition:
+            directories, self.directories = self.directories, set()
+            error, self.error = self.error, None
+            stats, self.stats = self.stats, self.new_stats()
+        if self.durable:
+            for directory in directories:
+                fsync_directory(directory)
+        if error is not None:
+            raise error
+        return stats
+
+def fsync_directory(directory):
+    """Make new directory entries durable; not every platform can open a directory for this."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# Queue bound of the sink in low-memory mode
+LOW_MEMORY_PENDING_BYTES = 8 * 1024 * 1024
+
+# One sink per process. Forked page workers inherit the parent's object but
+# not its thread, so they start their own.
+_sink = None
+_sink_pid = None
+
+def get_sink():
+    """Return this process's output sink.
+
+    The writer thread is a daemon, so the sink is drained at interpreter
+    exit as well: callers that never call drain_outputs() still get their
+    files, and a failed write is raised there instead of being lost.
+    """
+    global _sink, _sink_pid
+    if _sink is None or _sink_pid != os.getpid():
+        _sink = OutputSink()
+        _sink_pid = os.getpid()
+        atexit.register(drain_outputs)
+    return _sink
+
+def limit_pending_bytes(max_pending_bytes):
+    """Lower the queue bound of this process's sink, for the rest of the process."""
+    sink = get_sink()
+    with sink.condition:
+        sink.max_pending_bytes = min(sink.max_pending_bytes, max_pending_bytes)
+
+def write_output(filename, data):
+    """Queue a whole file on this process's sink."""
+    get_sink().write(filename, data)
+
+def open_output(filename, mode="w", encoding="utf-8", newline=None):
+    """Open a file whose contents are written by this process's sink."""
+    return get_sink().open(filename, mode, encoding, newline)
+
+def wait_outputs():
+    """Block until this process's queued files are written."""
+    if _sink is not None and _sink_pid == os.getpid():
+        _sink.wait()
+
+def drain_outputs():
+    """Barrier: make every file queued by this process durable and report the sink's statistics."""
+    if _sink is None or _sink_pid != os.getpid():
+        return
+    with profiling.stage("sink_drain"):
+        stats = _sink.drain()
+    for name in ("files", "bytes", "batches", "waits"):
+        profiling.count(f"output_{name}", stats[name])
+    if stats["files"]:
+        print(f"Flushed {stats['files']} files ({stats['bytes'] / 1048576:.1f} MiB) in {stats['batches']} batches; "
+              f"producers waited {stats['waits']} times ({stats['wait_seconds']:.2f} s) on a full queue, "
+              f"peak {stats['peak_pending_bytes'] / 1048576:.1f} MiB queued")
@@ -0,0 +1,111 @@
+import math
+import re
+import fitz  # PyMuPDF
+
+import profiling
+
+# Bands found per PDF in this process
+_bands = {}
+
+NO_BANDS = {"header": 0.0, "footer": 0.0}
+
+def sample_page_numbers(page_count, samples):
+    """Pick up to `samples` page numbers spread evenly over the document."""
+    count = min(samples, page_count)
+    return sorted({i * page_count // count for i in range(count)}) if count else []
+
+def table_rects(page, tolerance):
+    """Return the rectangles of the tables PyMuPDF finds on a page, grown by the tolerance."""
+    if not hasattr(page, "find_tables"):
+        return []
+    return [fitz.Rect(table.bbox) + (-tolerance, -tolerance, tolerance, tolerance)
+            for table in page.find_tables().tables]
+
+def band_elements(page, band_ratio, tolerance):
+    """Yield (edge, key, start, extent) for text blocks and horizontal rules near the top or bottom of a page.
+
+    `edge` is "header" or "footer"; `start` and `extent` are how far the
+    element's near and far sides lie from that edge. Text is keyed by its
+    position and its words with digits masked, so running page numbers
+    still match; rules by position only. Anything inside one of the page's
+    tables is skipped, so a table starting at the same height on every page
+    is not taken for a running header.
+    """
+    rect = page.rect
+    limit = rect.height * band_ratio
+    tables = table_rects(page, tolerance)
+
+    def place(kind, x0, y0, x1, y1, key):
+        if any(fitz.Rect(x0, y0, x1, y1) in table for table in tables):
+            return
+        if y1 - rect.y0 <= limit:
+            yield "header", (kind, round((y0 - rect.y0) / tolerance), key), y0 - rect.y0, y1 - rect.y0
+        elif rect.y1 - y0 <= limit:
+            yield "footer", (kind, round((rect.y1 - y1) / tolerance), key), rect.y1 - y1, rect.y1 - y0
+
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type == 0 and text.strip():
+            yield from place("text", x0, y0, x1, y1, re.sub(r"\d+", "#", " ".join(text.split())))
+    for drawing in page.get_drawings():
+        for shape in drawing["items"]:
+            if shape[0] == 'l' and abs(shape[1].y - shape[2].y) < tolerance:
+                (x0, x1), (y0, y1) = sorted((shape[1].x, shape[2].x)), sorted((shape[1].y, shape[2].y))
+            elif shape[0] == 're' and shape[1].height < tolerance:
+                x0, y0, x1, y1 = shape[1]
+            else:
+                continue
+            yield from place("rule", x0, y0, x1, y1, None)
+
+def detect_bands(pdf_path, samples=12, band_ratio=0.12, min_share=0.6, tolerance=2, margin=1, max_gap=12):
+    """Learn the header and footer bands of a document from a sample of its pages.
+
+    Text blocks and horizontal rules outside tables that sit at the same
+    height on at least `min_share` of the sampled pages, within `band_ratio`
+    of the page height from the top or bottom edge, are running headers and
+    footers. Each band grows outward from the page edge: it starts at the
+    recurring element nearest the edge and takes in the next one only while
+    the gap to it is at most `max_gap` points. Returns {"header": points
+    from the top, "footer": points from the bottom} covering them plus
+    `margin`; both are 0 when nothing repeats, or when the document has a
+    single page.
+    """
+    document = fitz.open(pdf_path)
+    try:
+        page_numbers = sample_page_numbers(document.page_count, samples)
+        if len(page_numbers) < 2:
+            return dict(NO_BANDS)
+        seen = {}  # (edge, key) -> [pages, nearest start, deepest extent]
+        for page_number in page_numbers:
+            page = document.load_page(page_number)
+            for edge, key, start, extent in band_elements(page, band_ratio, tolerance):
+                entry = seen.setdefault((edge, key), [set(), start, extent])
+                entry[0].add(page_number)
+                entry[1] = min(entry[1], start)
+                entry[2] = max(entry[2], extent)
+    finally:
+        document.close()
+
+    needed = max(2, math.ceil(min_share * len(page_numbers)))
+    bands = dict(NO_BANDS)
+    for edge in bands:
+        reach = None
+        for start, extent in sorted((start, extent) for (element_edge, _), (pages, start, extent) in seen.items()
+                                    if element_edge == edge and len(pages) >= needed):
+            if reach is not None and start > reach + max_gap:
+                break
+            reach = extent if reach is None else max(reach, extent)
+        if reach is not None:
+            bands[edge] = round(reach + margin, 2)
+    return bands
+
+def document_bands(pdf_path, **options):
+    """Return the header and footer bands of a PDF, detecting them once per process."""
+    if pdf_path not in _bands:
+        with profiling.stage("detect_bands"):
+            _bands[pdf_path] = detect_bands(pdf_path, **options)
+        print(f"Header band {_bands[pdf_path]['header']} pt, footer band {_bands[pdf_path]['footer']} pt: {pdf_path}")
+    return _bands[pdf_path]
+
+def body_clip(bands, page_rect):
+    """Return the part of a page between its header and footer bands."""
+    return fitz.Rect(page_rect.x0, page_rect.y0 + bands["header"], page_rect.x1, page_rect.y1 - bands["footer"])
@@ -0,0 +1,79 @@
+import profiling
+
+try:
+    import pdfplumber  # Optional fallback for PyMuPDF builds without find_tables
+except ImportError:
+    pdfplumber = None
+
+# Everything the exporters can ask for
+ALL_PARTS = ("drawings", "text", "tables", "images")
+
+# pdfplumber documents opened by the fallback, one per PDF in this process
+_plumber_documents = {}
+
+def plumber_page(pdf_path, page_number):
+    """Return a pdfplumber page, keeping one pdfplumber document open per PDF."""
+    if pdf_path not in _plumber_documents:
+        _plumber_documents[pdf_path] = pdfplumber.open(pdf_path)
+    return _plumber_documents[pdf_path].pages[page_number]
+
+def close_plumber_documents():
+    """Close the pdfplumber documents opened by the fallback."""
+    for pdf in _plumber_documents.values():
+        pdf.close()
+    _plumber_documents.clear()
+
+def table_columns(cells, tolerance=1):
+    """Return the x positions of a table's column boundaries, left to right, from its cell boxes.
+
+    Positions closer than `tolerance` points are one boundary; spanned
+    cells (None) are skipped.
+    """
+    edges = []
+    for x in sorted({cell[0] for cell in cells if cell} | {cell[2] for cell in cells if cell}):
+        if not edges or x - edges[-1] > tolerance:
+            edges.append(round(x, 2))
+    return edges
+
+def find_page_tables(page, page_number):
+    """Find the tables of a page; return their rows and their column boundaries (see table_columns), in two lists."""
+    if hasattr(page, "find_tables"):
+        found = page.find_tables().tables
+        return [table.extract() for table in found], [table_columns(table.cells) for table in found]
+    if pdfplumber is not None:
+        plumber = plumber_page(page.parent.name, page_number)
+        try:
+            found = plumber.find_tables()
+            return [table.extract() for table in found], [table_columns(table.cells) for table in found]
+        finally:
+            plumber.close()  # pdfplumber keeps a page's layout objects until it is closed
+    print(f"Table extraction needs PyMuPDF 1.23+ or pdfplumber; skipping tables on page {page_number + 1}.")
+    return [], []
+
+def read_page(page, page_number, parts=ALL_PARTS, clip=None):
+    """Parse a PyMuPDF page once and return the data the exporters share.
+
+    The result holds the page size plus the requested parts: `drawings`
+    (page.get_drawings()), `text` (plain text in reading order), `tables`
+    (lists of rows, with their column boundaries in `table_columns`) and
+    `images` (page.get_images(full=True)). With `clip`, the text is limited
+    to that part of the page.
+    """
+    data = {"number": page_number, "width": page.rect.width, "height": page.rect.height}
+    if "drawings" in parts:
+        with profiling.stage("get_drawings"):
+            data["drawings"] = page.get_drawings()
+        profiling.count("drawings", len(data["drawings"]))
+    if "text" in parts:
+        with profiling.stage("get_text"):
+            data["text"] = page.get_text("text", clip=clip, sort=True)
+    if "tables" in parts:
+        with profiling.stage("extract_tables"):
+            data["tables"], data["table_columns"] = find_page_tables(page, page_number)
+        profiling.count("tables", len(data["tables"]))
+        profiling.count("table_cells", sum(len(row) for table in data["tables"] for row in table))
+    if "images" in parts:
+        with profiling.stage("get_images"):
+            data["images"] = page.get_images(full=True)
+        profiling.count("images", len(data["images"]))
+    return data
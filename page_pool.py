@@ -0,0 +1,113 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+
+from output_sink import LOW_MEMORY_PENDING_BYTES, drain_outputs, limit_pending_bytes
+from page_data import close_plumber_documents
+import profiling
+
+# In low-memory mode: pages read before a document is reopened, and page
+# results held at once across all in-flight chunks
+LOW_MEMORY_PAGES = 64
+
+def page_count(pdf_path):
+    """Return the number of pages in a PDF."""
+    document = fitz.open(pdf_path)
+    try:
+        return document.page_count
+    finally:
+        document.close()
+
+def chunk_pages(page_numbers, chunk_size):
+    """Split page numbers into consecutive chunks."""
+    return [page_numbers[i:i + chunk_size] for i in range(0, len(page_numbers), chunk_size)]
+
+def iter_pages(pdf_path, page_numbers, page_func, args=(), low_memory=False):
+    """Open a private document handle and yield (page_number, result) for each page.
+
+    The document is opened by file name, so MuPDF reads it on demand rather
+    than loading it whole. MuPDF keeps every object it has parsed until the
+    document is closed, so with `low_memory` the document, and the
+    pdfplumber one of the table fallback, is reopened every LOW_MEMORY_PAGES
+    pages to keep memory flat on very long documents; the output sink's
+    queue is capped at LOW_MEMORY_PENDING_BYTES as well.
+    """
+    profiling.set_document(pdf_path)
+    if low_memory:
+        limit_pending_bytes(LOW_MEMORY_PENDING_BYTES)
+    document = fitz.open(pdf_path)
+    try:
+        for index, page_number in enumerate(page_numbers):
+            if low_memory and index and index % LOW_MEMORY_PAGES == 0:
+                document.close()
+                fitz.TOOLS.store_shrink(100)  # Closing does not drop the images MuPDF decoded for it
+                close_plumber_documents()
+                document = fitz.open(pdf_path)
+            profiling.set_page(page_number)
+            with profiling.stage("page"):
+                with profiling.stage("load_page"):
+                    page = document.load_page(page_number)
+                result = page_func(page, page_number, *args)
+                page = None  # Release the page now rather than when the next one replaces it
+            profiling.sample_memory()
+            profiling.set_page(None)
+            yield page_number, result
+    finally:
+        document.close()
+
+def process_chunk(pdf_path, page_numbers, page_func, args=(), profile_settings=None, low_memory=False):
+    """Worker entry point: process one chunk of pages and return their results and measurements.
+
+    The files the pages wrote are durable by the time the results return.
+    """
+    profiling.configure(profile_settings)
+    with profiling.capture(f"pages_{page_numbers[0] + 1}-{page_numbers[-1] + 1}"):
+        results = list(iter_pages(pdf_path, page_numbers, page_func, args, low_memory))
+        drain_outputs()
+    return results, profiling.collect()
+
+def map_pages(pdf_path, page_numbers, page_func, args=(), workers=None, chunk_size=None, low_memory=False):
+    """Run page_func(page, page_number, *args) over pages and yield (page_number, result) in page order.
+
+    With more than one worker, each worker process opens its own fitz document
+    and handles a chunk of consecutive pages. At most two chunks per worker
+    are in flight, and results are yielded in the order of `page_numbers`, so
+    callers see exactly what the serial path (workers=1) produces. With
+    `low_memory`, chunks shrink so that at most LOW_MEMORY_PAGES page results
+    wait in this process, whatever the page count, and this process's output
+    sink is capped like the workers' (see iter_pages).
+    page_func must be a module-level function so it can be pickled.
+    """
+    page_numbers = list(page_numbers)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(page_numbers)))
+
+    if low_memory:
+        limit_pending_bytes(LOW_MEMORY_PENDING_BYTES)
+    if workers == 1:
+        yield from iter_pages(pdf_path, page_numbers, page_func, args, low_memory)
+        return
+
+    if chunk_size is None:
+        chunk_size = max(1, len(page_numbers) // (workers * 4))
+    if low_memory:
+        chunk_size = max(1, min(chunk_size, LOW_MEMORY_PAGES // (workers * 2)))
+    chunks = iter(chunk_pages(page_numbers, chunk_size))
+
+    profile_settings = profiling.settings()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(process_chunk, pdf_path, chunk, page_func, args, profile_settings, low_memory))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            results, records = pending.popleft().result()
+            profiling.merge(records)
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                pending.append(pool.submit(process_chunk, pdf_path, next_chunk, page_func, args, profile_settings,
+                                           low_memory))
+            yield from results
@@ -0,0 +1,173 @@
+import cProfile
+import csv
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+# Per-process state. Worker processes send theirs to the parent with collect()
+# and the parent folds it in with merge().
+_settings = {"enabled": False, "cprofile": None}
+_document = None
+_page = None
+_timings = {}  # (document, page, stage) -> [calls, wall seconds, cpu seconds, peak RSS growth in KiB]
+_counters = {}  # (document, page, name) -> count
+_memory = {}  # (document, page) -> peak RSS in KiB after the page
+
+def enable(cprofile_path=None):
+    """Turn on stage timers, counters and memory sampling, optionally with a cProfile capture."""
+    _settings["enabled"] = True
+    _settings["cprofile"] = cprofile_path
+
+def settings():
+    """Return the settings to hand to worker processes."""
+    return dict(_settings)
+
+def configure(worker_settings):
+    """Apply the parent's settings in a worker process."""
+    if worker_settings:
+        _settings.update(worker_settings)
+
+def enabled():
+    return _settings["enabled"]
+
+def set_document(document):
+    global _document
+    _document = document
+
+def set_page(page_number):
+    global _page
+    _page = page_number
+
+def peak_rss():
+    """Peak resident memory of this process so far, in KiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current page in wall-clock and CPU seconds.
+
+    Also records how far the stage pushed the process's peak memory, so the
+    stages that set the high-water mark stand out.
+    """
+    if not _settings["enabled"]:
+        yield
+        return
+    wall, cpu, rss = time.perf_counter(), time.process_time(), peak_rss()
+    try:
+        yield
+    finally:
+        entry = _timings.setdefault((_document, _page, name), [0, 0.0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += time.perf_counter() - wall
+        entry[2] += time.process_time() - cpu
+        entry[3] = max(entry[3], peak_rss() - rss)
+
+def count(name, n=1):
+    """Add to a counter (drawings, paths, images, table cells...) of the current page."""
+    if _settings["enabled"]:
+        key = (_document, _page, name)
+        _counters[key] = _counters.get(key, 0) + n
+
+def sample_memory():
+    """Record the peak resident memory of this process against the current page."""
+    if _settings["enabled"]:
+        _memory[(_document, _page)] = peak_rss()
+
+@contextmanager
+def capture(label):
+    """Run a block under cProfile when a capture path is set, dumping to <path>.<pid>.<label>."""
+    path = _settings["cprofile"]
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{path}.{os.getpid()}.{label}")
+
+def collect():
+    """Return and clear this process's measurements."""
+    records = {
+        "timings": [list(key) + values for key, values in _timings.items()],
+        "counters": [list(key) + [value] for key, value in _counters.items()],
+        "memory": [list(key) + [value] for key, value in _memory.items()],
+    }
+    _timings.clear()
+    _counters.clear()
+    _memory.clear()
+    return records
+
+def merge(records):
+    """Fold measurements collected in another process into this one."""
+    for document, page, name, calls, wall, cpu, rss_growth in records["timings"]:
+        entry = _timings.setdefault((document, page, name), [0, 0.0, 0.0, 0])
+        entry[0] += calls
+        entry[1] += wall
+        entry[2] += cpu
+        entry[3] = max(entry[3], rss_growth)
+    for document, page, name, value in records["counters"]:
+        _counters[(document, page, name)] = _counters.get((document, page, name), 0) + value
+    for document, page, value in records["memory"]:
+        _memory[(document, page)] = max(_memory.get((document, page), 0), value)
+
+def stage_totals():
+    """Return the stage measurements summed over all pages, by stage name."""
+    stages = {}
+    for (_, _, name), (calls, wall, cpu, rss_growth) in _timings.items():
+        total = stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rss_growth_kib": 0})
+        total["calls"] += calls
+        total["wall_s"] += wall
+        total["cpu_s"] += cpu
+        total["rss_growth_kib"] = max(total["rss_growth_kib"], rss_growth)
+    return stages
+
+def write_report(path):
+    """Write the measurements as JSON (totals plus per-page detail) or, for a .csv path, as flat rows."""
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(["document", "page", "kind", "name", "calls", "wall_s", "cpu_s", "rss_growth_kib", "value"])
+            for (document, page, name), (calls, wall, cpu, rss_growth) in sorted(_timings.items(), key=_sort_key):
+                writer.writerow([document, _page_label(page), "stage", name, calls, f"{wall:.6f}", f"{cpu:.6f}",
+                                 rss_growth, ""])
+            for (document, page, name), value in sorted(_counters.items(), key=_sort_key):
+                writer.writerow([document, _page_label(page), "counter", name, "", "", "", "", value])
+            for (document, page), value in sorted(_memory.items(), key=_sort_key):
+                writer.writerow([document, _page_label(page), "memory", "peak_rss_kib", "", "", "", "", value])
+        print(f"Profiling report saved to {path}")
+        return
+
+    counters = {}
+    for (_, _, name), value in _counters.items():
+        counters[name] = counters.get(name, 0) + value
+    pages = {}
+    for (document, page, name), (calls, wall, cpu, rss_growth) in _timings.items():
+        entry = pages.setdefault((document, page), {"stages": {}, "counters": {}})
+        entry["stages"][name] = {"calls": calls, "wall_s": wall, "cpu_s": cpu, "rss_growth_kib": rss_growth}
+    for (document, page, name), value in _counters.items():
+        pages.setdefault((document, page), {"stages": {}, "counters": {}})["counters"][name] = value
+    for (document, page), value in _memory.items():
+        pages.setdefault((document, page), {"stages": {}, "counters": {}})["peak_rss_kib"] = value
+    report = {
+        "stages": stage_totals(),
+        "counters": counters,
+        "peak_rss_kib": max(_memory.values(), default=0),
+        "pages": [dict(document=document, page=_page_label(page), **entry)
+                  for (document, page), entry in sorted(pages.items(), key=_sort_key)],
+    }
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=1)
+    print(f"Profiling report saved to {path}")
+
+def _page_label(page):
+    """Pages are reported 1-based, like the output file names; None marks document-level work."""
+    return None if page is None else page + 1
+
+def _sort_key(item):
+    document, page, *rest = item[0]
+    return (document or "", -1 if page is None else page, *rest)
@@ -0,0 +1,278 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from PIL import Image, ImageChops, ImageStat
+
+import profiling
+from synthetic_pdfs import (synthetic_banded_pdf, synthetic_figure_pdf, synthetic_spanning_table_pdf, synthetic_table_pdf,
+                            synthetic_tiled_image_pdf, synthetic_vector_pdf)
+
+# Regression cases: name -> (generator, page count). Each synthetic PDF is
+# regenerated on every run and processed by every extraction script.
+CASES = {
+    "tables": (synthetic_table_pdf, 4),  # Bond and grid lines, a table continued over pages
+    "spanning": (synthetic_spanning_table_pdf, 8),  # Tables over page breaks told apart by column positions only
+    "bands": (synthetic_banded_pdf, 4),  # Header and footer separators, illustration next to a table
+    "tiles": (synthetic_tiled_image_pdf, 2),  # One picture embedded as a grid of tiles
+    "figures": (synthetic_figure_pdf, 2),  # Two tiled figures and a single picture per page
+    "vectors": (synthetic_vector_pdf, 2),  # Pages with 1500 vector paths
+}
+
+SCRIPTS = ("version_1", "version_2", "version_3")
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+BASELINE_NAME = "baseline.json"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+def run_script(script, pdf_path, work_dir):
+    """Worker entry point: run one script on one PDF in a fresh process and measure it.
+
+    The output directory is given relative to `work_dir` so the paths
+    embedded in content.txt are the same on every machine. Returns (pages,
+    seconds, peak RSS in KiB, stage totals, profiling records).
+    """
+    module = __import__(script)
+    os.chdir(work_dir)
+    profiling.enable()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        pages = module.process_document(pdf_path, "out", workers=1)
+        elapsed = time.perf_counter() - start
+    return pages, elapsed, profiling.peak_rss(), profiling.stage_totals(), profiling.collect()
+
+def list_files(directory):
+    """Return the files below a directory as sorted relative paths."""
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(files)
+
+def images_match(path_a, path_b, max_mean_difference=2.0):
+    """Compare two images by pixels, allowing for small differences between JPEG encoders."""
+    with Image.open(path_a) as image_a, Image.open(path_b) as image_b:
+        if image_a.size != image_b.size:
+            return False
+        difference = ImageChops.difference(image_a.convert("RGB"), image_b.convert("RGB"))
+        return max(ImageStat.Stat(difference).mean) <= max_mean_difference
+
+def first_difference(path_a, path_b):
+    """Describe where two text files first differ."""
+    with open(path_a, encoding="utf-8", errors="replace") as file_a, open(path_b, encoding="utf-8", errors="replace") as file_b:
+        lines_a, lines_b = file_a.read().splitlines(), file_b.read().splitlines()
+    for number, (line_a, line_b) in enumerate(zip(lines_a, lines_b), 1):
+        if line_a != line_b:
+            return f"line {number}: {line_a[:60]!r} != {line_b[:60]!r}"
+    return f"{len(lines_a)} lines != {len(lines_b)} lines"
+
+def compare_outputs(actual_dir, golden_dir):
+    """Return a list of differences between the files produced and the golden files."""
+    actual, golden = set(list_files(actual_dir)), set(list_files(golden_dir))
+    problems = [f"missing {name}" for name in sorted(golden - actual)]
+    problems += [f"unexpected {name}" for name in sorted(actual - golden)]
+    for name in sorted(actual & golden):
+        path_a, path_b = os.path.join(actual_dir, name), os.path.join(golden_dir, name)
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            if not images_match(path_a, path_b):
+                problems.append(f"{name}: pixels differ")
+        else:
+            with open(path_a, "rb") as file_a, open(path_b, "rb") as file_b:
+                if file_a.read() != file_b.read():
+                    problems.append(f"{name}: {first_difference(path_a, path_b)}")
+    return problems
+
+# One command of SVG path data and its numbers
+SVG_COMMAND = re.compile(r"([MmLlHhVvCcZz])([^MmLlHhVvCcZz]*)")
+
+def svg_horizontal_segments(svg_path):
+    """Return the horizontal segments drawn in an SVG as (y, x0, x1) page coordinates rounded to points.
+
+    Reads the path data SvgWriter writes (M/m/L/l/H/h/V/v/C/c/z), flipping y
+    back against the page height.
+    """
+    with open(svg_path, encoding="utf-8") as svg_file:
+        text = svg_file.read()
+    height = float(re.search(r'height="([-\d.]+)"', text).group(1))
+    segments = set()
+    for data in re.findall(r'<path d="([^"]*)"', text):
+        x = y = start_x = start_y = 0.0
+        for command, numbers in SVG_COMMAND.findall(data):
+            values = [float(value) for value in numbers.split()]
+            if command in "Mm":
+                x, y = (values[0], values[1]) if command == "M" else (x + values[0], y + values[1])
+                start_x, start_y = x, y
+            elif command in "HhLl":
+                if command == "H":
+                    end_x, end_y = values[0], y
+                elif command == "h":
+                    end_x, end_y = x + values[0], y
+                elif command == "L":
+                    end_x, end_y = values[0], values[1]
+                else:
+                    end_x, end_y = x + values[0], y + values[1]
+                if end_y == y:
+                    segments.add((round(height - y), round(min(x, end_x)), round(max(x, end_x))))
+                x, y = end_x, end_y
+            elif command in "Vv":
+                y = values[0] if command == "V" else y + values[0]
+            elif command in "Cc":
+                x, y = (values[4], values[5]) if command == "C" else (x + values[4], y + values[5])
+            else:
+                x, y = start_x, start_y
+    return segments
+
+def table_checks(pdf_path, out_dir, script, bond_ratio=1.5, tolerance=2):
+    """Check the outputs against the tables of the PDF itself, whatever the golden files say.
+
+    The tables are those PyMuPDF finds on each page. version_3's content.txt
+    must have the words of every table's first row (its header, if any) on
+    one line, and version_1's table wireframe SVG must hold every bond line
+    of its page: a horizontal table rule at least `bond_ratio` times as
+    thick as the thinnest one. Returns a list of problems.
+    """
+    problems = []
+    if script == "version_3":
+        with open(os.path.join(out_dir, "content.txt"), encoding="utf-8") as content_file:
+            lines = [line.split() for line in content_file]
+    document = fitz.open(pdf_path)
+    try:
+        for page in document:
+            with contextlib.redirect_stdout(io.StringIO()):
+                tables = page.find_tables().tables
+            if script == "version_3":
+                for table in tables:
+                    words = " ".join(cell for cell in table.extract()[0] if cell).split()
+                    if not any(fits_in_order(words, line) for line in lines):
+                        problems.append(f"content.txt: first row {' '.join(words)!r} of a table on page "
+                                        f"{page.number + 1} is missing")
+            elif script == "version_1" and tables:
+                areas = [fitz.Rect(table.bbox) + (-tolerance, -tolerance, tolerance, tolerance) for table in tables]
+                rules = []
+                for drawing in page.get_drawings():
+                    for shape in drawing["items"]:
+                        if (shape[0] == 'l' and abs(shape[1].y - shape[2].y) < tolerance
+                                and any(shape[1] in area and shape[2] in area for area in areas)):
+                            rules.append((drawing.get("width") or 0, round(shape[1].y),
+                                          round(min(shape[1].x, shape[2].x)), round(max(shape[1].x, shape[2].x))))
+                widths = [width for width, *_ in rules if width > 0]
+                bonds = {tuple(rule) for width, *rule in rules if widths and width >= min(widths) * bond_ratio}
+                wireframe = os.path.join(out_dir, f"page_{page.number + 1}_table_wireframe.svg")
+                drawn = svg_horizontal_segments(wireframe) if os.path.exists(wireframe) else set()
+                for y, x0, x1 in sorted(bonds - drawn):
+                    problems.append(f"page_{page.number + 1}_table_wireframe.svg: bond line at y={y} "
+                                    f"from x={x0} to {x1} is missing")
+    finally:
+        document.close()
+    return problems
+
+def fits_in_order(words, line):
+    """Check whether `words` appear in `line` (a list of words) in the same order."""
+    remaining = iter(line)
+    return all(word in remaining for word in words)
+
+def load_baseline():
+    path = os.path.join(GOLDEN_DIR, BASELINE_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+def save_baseline(baseline):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    with open(os.path.join(GOLDEN_DIR, BASELINE_NAME), "w") as baseline_file:
+        json.dump(baseline, baseline_file, indent=1, sort_keys=True)
+
+def run_suite(cases, scripts, update=False, max_slowdown=None, stage_count=5):
+    """Generate every case, run every script on it, and check outputs and throughput.
+
+    Every run must first pass table_checks. With `update`, its outputs then
+    become the new golden files and the measured throughput the new
+    baseline. Otherwise outputs must match the golden files, and with `max_slowdown` (e.g. 0.3) a run more than that fraction
+    slower than its baseline pages/s also fails. Returns the number of
+    failed runs.
+    """
+    baseline = load_baseline()
+    # A fresh process per run keeps the peak memory figures separate
+    context = multiprocessing.get_context("spawn")
+    failures = 0
+    print(f"{'case':<8} {'script':<10} {'pages':>5} {'pages/s':>8} {'baseline':>8} {'peak MiB':>8}  result")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for case in cases:
+            generator, page_count = CASES[case]
+            pdf_path = os.path.join(tmp_dir, f"{case}.pdf")
+            generator(pdf_path, page_count)
+            for script in scripts:
+                work_dir = os.path.join(tmp_dir, case, script)
+                os.makedirs(work_dir)
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    pages, seconds, peak_rss, stages, records = pool.submit(run_script, script, pdf_path, work_dir).result()
+                profiling.merge(records)
+
+                rate = pages / seconds if seconds else 0.0
+                golden_dir = os.path.join(GOLDEN_DIR, case, script)
+                recorded = baseline.get(case, {}).get(script, {})
+                # Outputs must be right before they can become golden files
+                problems = table_checks(pdf_path, os.path.join(work_dir, "out"), script)
+                if update and not problems:
+                    shutil.rmtree(golden_dir, ignore_errors=True)
+                    shutil.copytree(os.path.join(work_dir, "out"), golden_dir)
+                    baseline.setdefault(case, {})[script] = {"pages_per_s": round(rate, 2), "peak_rss_kib": peak_rss}
+                    result = "recorded"
+                elif update:
+                    result = "FAIL"
+                elif not os.path.isdir(golden_dir):
+                    problems.append("no golden outputs; run with --update")
+                    result = "FAIL"
+                else:
+                    problems += compare_outputs(os.path.join(work_dir, "out"), golden_dir)
+                    if max_slowdown is not None and recorded and rate < recorded["pages_per_s"] * (1 - max_slowdown):
+                        problems.append(f"throughput {rate:.1f} pages/s is below the baseline {recorded['pages_per_s']}")
+                    result = "FAIL" if problems else "ok"
+                failures += bool(problems)
+
+                baseline_rate = f"{recorded['pages_per_s']:.1f}" if recorded else "-"
+                print(f"{case:<8} {script:<10} {pages:>5} {rate:>8.1f} {baseline_rate:>8} {peak_rss / 1024:>8.1f}  {result}")
+                for problem in problems[:10]:
+                    print(f"    {problem}")
+                if len(problems) > 10:
+                    print(f"    ... and {len(problems) - 10} more")
+                slowest = sorted(stages.items(), key=lambda item: -item[1]["wall_s"])
+                for name, totals in [item for item in slowest if item[0] != "page"][:stage_count]:
+                    print(f"    {name:<18} {totals['wall_s'] / pages * 1000:8.2f} ms/page "
+                          f"{totals['calls']:>6} calls  +{totals['rss_growth_kib'] / 1024:.1f} MiB peak")
+
+    if update:
+        save_baseline(baseline)
+        print(f"Golden outputs and baseline saved under {GOLDEN_DIR}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Regression and throughput suite on synthetic PDFs.")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--scripts", nargs="+", choices=SCRIPTS, default=list(SCRIPTS))
+    parser.add_argument("--update", action="store_true", help="record the outputs as golden files and the throughput as baseline")
+    parser.add_argument("--max-slowdown", type=float, default=None,
+                        help="fail runs slower than the baseline by more than this fraction (e.g. 0.3)")
+    parser.add_argument("--report", metavar="PATH", help="write the per-page profiling report (JSON, or CSV for a .csv path)")
+    args = parser.parse_args()
+
+    profiling.enable()
+    failures = run_suite(args.cases, args.scripts, args.update, args.max_slowdown)
+    if args.report:
+        profiling.write_report(args.report)
+    if failures:
+        print(f"{failures} runs failed.")
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
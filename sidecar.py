@@ -0,0 +1,131 @@
+import io
+import json
+import os
+
+from output_sink import write_output
+import profiling
+
+try:
+    import pyarrow  # Optional: Parquet sidecars
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SIDECAR_NAME = "content_index"
+
+# One row per text block, table cell, image and vector group
+COLUMNS = ("page", "type", "x0", "y0", "x1", "y1", "offset", "file")
+
+def rounded_bbox(bbox):
+    """Return (x0, y0, x1, y1) rounded to hundredths of a point, or four Nones for an unknown box."""
+    if bbox is None:
+        return (None, None, None, None)
+    return tuple(round(value, 2) for value in bbox)
+
+def byte_offset(text, position):
+    """Turn a character position in `text` into a UTF-8 byte offset; -1 stays -1."""
+    return len(text[:position].encode("utf-8")) if position >= 0 else -1
+
+def text_rows(page, text, clip=None):
+    """Return a ("text", bbox, offset, None) row per text block, with offsets into the page's content.txt text.
+
+    `text` is the page text as written to content.txt. Each block is found
+    there by its first line, searching forward from the previous block, so
+    offsets follow reading order; a block that cannot be found gets -1.
+    Returns the rows and the [bbox, character position] of every block
+    found, for placing table cells.
+    """
+    rows, placed = [], []
+    cursor = 0
+    for x0, y0, x1, y1, block_text, _, block_type in page.get_text("blocks", clip=clip, sort=True):
+        lines = [line for line in block_text.splitlines() if line.strip()]
+        if block_type != 0 or not lines:
+            continue
+        position = text.find(lines[0], cursor)
+        if position >= 0:
+            cursor = position + len(lines[0])
+            placed.append(((x0, y0, x1, y1), position))
+        rows.append(("text", rounded_bbox((x0, y0, x1, y1)), byte_offset(text, position), None))
+    return rows, placed
+
+def cell_rows(page, text, placed, clip=None):
+    """Return a ("table_cell", bbox, offset, None) row per cell of the tables PyMuPDF finds on the page.
+
+    A cell's offset points at its text inside the block it overlaps most,
+    or at that block when the text is split differently; cells overlapping
+    no block get -1. Spanned cells are skipped.
+    """
+    if not hasattr(page, "find_tables"):
+        return []
+    rows = []
+    for table in page.find_tables(clip=clip).tables:
+        for table_row, cell_texts in zip(table.rows, table.extract()):
+            for bbox, cell_text in zip(table_row.cells, cell_texts):
+                if bbox is None:
+                    continue
+                position, best = -1, 0.0
+                for (x0, y0, x1, y1), start in placed:
+                    overlap = (max(0.0, min(x1, bbox[2]) - max(x0, bbox[0]))
+                               * max(0.0, min(y1, bbox[3]) - max(y0, bbox[1])))
+                    if overlap > best:
+                        position, best = start, overlap
+                first_line = (cell_text or "").strip().split("\n")[0]
+                if position >= 0 and first_line:
+                    found = text.find(first_line, position)
+                    position = found if found >= 0 else position
+                rows.append(("table_cell", rounded_bbox(bbox), byte_offset(text, position), None))
+    return rows
+
+def page_rows(page, text, clip=None, images=(), image_boxes=(), svg_path=None, svg_groups=()):
+    """Build the sidecar rows of one page as (type, bbox, offset, file) tuples.
+
+    Text blocks and table cells point into the page's text in content.txt:
+    their file is None and their offset counts from the start of that page's
+    text, until add_page() places them. Images point at their own file
+    (offset 0) and vector groups at their element in the page's SVG.
+    """
+    with profiling.stage("sidecar_rows"):
+        rows, placed = text_rows(page, text, clip)
+        rows += cell_rows(page, text, placed, clip)
+        rows += [("image", rounded_bbox(bbox), 0, filename) for filename, bbox in zip(images, image_boxes)]
+        if svg_path:
+            rows += [("vector", rounded_bbox(bbox), offset, svg_path) for bbox, offset in svg_groups]
+    profiling.count("sidecar_rows", len(rows))
+    return rows
+
+class Sidecar:
+    """Rows of a whole document, kept column by column and written in one go."""
+
+    def __init__(self, output_dir, content_file):
+        self.output_dir = output_dir
+        self.content_file = content_file
+        self.columns = {name: [] for name in COLUMNS}
+
+    def add_page(self, page_number, rows, content_offset=0):
+        """Add a page's rows, placing its text rows at `content_offset` bytes into content.txt."""
+        columns = self.columns
+        for kind, bbox, offset, filename in rows:
+            if filename is None:
+                filename = self.content_file
+                if offset >= 0:
+                    offset += content_offset
+            columns["page"].append(page_number + 1)
+            columns["type"].append(kind)
+            for name, value in zip(("x0", "y0", "x1", "y1"), bbox):
+                columns[name].append(value)
+            columns["offset"].append(offset)
+            columns["file"].append(filename)
+
+    def save(self):
+        """Write the sidecar as Parquet when pyarrow is installed, JSON otherwise; return its file name."""
+        with profiling.stage("sidecar_write"):
+            if pyarrow is not None:
+                filename = os.path.join(self.output_dir, SIDECAR_NAME + ".parquet")
+                buffer = io.BytesIO()
+                pyarrow.parquet.write_table(pyarrow.table(self.columns), buffer)
+                write_output(filename, buffer.getvalue())
+            else:
+                filename = os.path.join(self.output_dir, SIDECAR_NAME + ".json")
+                write_output(filename, json.dumps({"columns": self.columns}, separators=(",", ":")))
+        print(f"Sidecar index with {len(self.columns['page'])} rows saved to {filename}")
+        return filename
@@ -0,0 +1,232 @@
+import gzip
+import io
+
+from output_sink import open_output
+import profiling
+
+DEFAULT_PRECISION = 2  # Decimal places kept for coordinates
+
+def format_units(units, precision):
+    """Format an integer count of 10**-precision units as the shortest decimal string."""
+    if precision <= 0:
+        return str(units)
+    digits = str(abs(units)).rjust(precision + 1, "0")
+    whole, fraction = digits[:-precision], digits[-precision:].rstrip("0")
+    sign = "-" if units < 0 else ""
+    return sign + whole + "." + fraction if fraction else sign + whole
+
+def color_to_hex(color, default="black"):
+    """Turn a PyMuPDF colour tuple (0..1 floats) into an SVG #rrggbb string."""
+    if not color:
+        return default
+    if len(color) == 1:  # Gray
+        color = (color[0], color[0], color[0])
+    elif len(color) == 4:  # CMYK
+        c, m, y, k = color
+        color = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    return "#%02x%02x%02x" % tuple(max(0, min(255, round(value * 255))) for value in color[:3])
+
+class SvgWriter:
+    """Collect the shapes of one page and write them as a compact SVG.
+
+    Coordinates are quantized to `precision` decimals and kept as integers, so
+    relative commands never accumulate rounding drift. Paths with the same
+    stroke colour and width are merged into a single <path>, and with
+    `relative` the path data uses relative m/l/h/v/c commands. The y axis is
+    flipped against the page height, as the scripts have always done.
+
+    Once written, `groups` lists a (page bbox, byte offset) pair for every
+    <rect> and merged <path>, in file order; offsets count the uncompressed
+    SVG text.
+    """
+
+    def __init__(self, width, height, precision=DEFAULT_PRECISION, relative=True):
+        self.width = width
+        self.height = height
+        self.precision = precision
+        self.scale = 10 ** precision
+        self.relative = relative
+        self.paths = {}  # (stroke, stroke width) -> {"parts": [...], "cursor": point}
+        self.styles = {}  # raw (colour, width) from the drawing -> entry of self.paths
+        self.rects = []
+        self.rect_boxes = []  # Page bbox of each entry of self.rects
+        self.groups = []
+
+    def quantize(self, x, y):
+        return round(x * self.scale), round((self.height - y) * self.scale)
+
+    def point(self, point):
+        return self.quantize(point.x, point.y)
+
+    def pair(self, x, y):
+        return f"{format_units(x, self.precision)} {format_units(y, self.precision)}"
+
+    def path(self, stroke, stroke_width):
+        """Return the merged path for a stroke style."""
+        style = (stroke, stroke_width)
+        path = self.styles.get(style)
+        if path is None:
+            key = (color_to_hex(stroke), stroke_width)
+            if key not in self.paths:
+                self.paths[key] = {"parts": [], "cursor": None, "bbox": None}
+            path = self.styles[style] = self.paths[key]
+        return path
+
+    def cover(self, path, rect):
+        """Grow a path's page bbox to include `rect`."""
+        bbox = path["bbox"]
+        if bbox is None:
+            path["bbox"] = (rect.x0, rect.y0, rect.x1, rect.y1)
+        else:
+            path["bbox"] = (min(bbox[0], rect.x0), min(bbox[1], rect.y0), max(bbox[2], rect.x1), max(bbox[3], rect.y1))
+
+    def move_to(self, path, point):
+        cursor = path["cursor"]
+        if cursor == point:
+            return  # Continues the previous segment; no move needed
+        if cursor is None or not self.relative:
+            path["parts"].append("M" + self.pair(*point))
+        else:
+            path["parts"].append("m" + self.pair(point[0] - cursor[0], point[1] - cursor[1]))
+        path["cursor"] = point
+
+    def add_line(self, p0, p1, stroke=None, stroke_width=None):
+        """Add a straight segment."""
+        self.line_to(self.path(stroke, stroke_width), self.point(p0), self.point(p1))
+
+    def line_to(self, path, start, end):
+        self.move_to(path, start)
+        if not self.relative:
+            path["parts"].append("L" + self.pair(*end))
+        else:
+            dx, dy = end[0] - start[0], end[1] - start[1]
+            if dy == 0:
+                path["parts"].append("h" + format_units(dx, self.precision))
+            elif dx == 0:
+                path["parts"].append("v" + format_units(dy, self.precision))
+            else:
+                path["parts"].append("l" + self.pair(dx, dy))
+        path["cursor"] = end
+
+    def add_curve(self, p0, p1, p2, p3, stroke=None, stroke_width=None):
+        """Add a cubic Bezier segment."""
+        path = self.path(stroke, stroke_width)
+        start = self.point(p0)
+        controls = [self.point(p) for p in (p1, p2, p3)]
+        self.move_to(path, start)
+        if self.relative:
+            pairs = [self.pair(x - start[0], y - start[1]) for x, y in controls]
+            path["parts"].append("c" + " ".join(pairs))
+        else:
+            path["parts"].append("C" + " ".join(self.pair(x, y) for x, y in controls))
+        path["cursor"] = controls[-1]
+
+    def add_rect_outline(self, rect, stroke=None, stroke_width=None):
+        """Add an unfilled rectangle as a closed subpath."""
+        path = self.path(stroke, stroke_width)
+        corners = [self.quantize(rect.x0, rect.y0), self.quantize(rect.x1, rect.y0),
+                   self.quantize(rect.x1, rect.y1), self.quantize(rect.x0, rect.y1)]
+        for start, end in zip(corners, corners[1:]):
+            self.line_to(path, start, end)
+        path["parts"].append("z")
+        path["cursor"] = corners[0]
+
+    def add_rect(self, rect, fill=None, fill_opacity=1.0):
+        """Add a filled rectangle."""
+        x, y = round(rect.x0 * self.scale), round((self.height - rect.y1) * self.scale)
+        w, h = round(rect.width * self.scale), round(rect.height * self.scale)
+        self.rects.append(
+            f'<rect x="{format_units(x, self.precision)}" y="{format_units(y, self.precision)}" '
+            f'width="{format_units(w, self.precision)}" height="{format_units(h, self.precision)}" '
+            f'fill="{color_to_hex(fill)}"'
+            + (f' fill-opacity="{fill_opacity:g}"' if fill_opacity != 1 else '') + '/>\n'
+        )
+        self.rect_boxes.append((rect.x0, rect.y0, rect.x1, rect.y1))
+
+    def is_empty(self):
+        return not self.rects and not any(path["parts"] for path in self.paths.values())
+
+    def write(self, filename, compress=False):
+        """Stream the SVG to the output sink, gzip-compressed (.svgz) when `compress` is set."""
+        profiling.count("svg_paths", len(self.paths))
+        profiling.count("svg_rects", len(self.rects))
+        with profiling.stage("svg_write"):
+            self.write_file(filename, compress)
+
+    def to_string(self):
+        """Return the SVG text instead of writing a file."""
+        buffer = io.StringIO()
+        self.write_svg(buffer)
+        return buffer.getvalue()
+
+    def write_file(self, filename, compress):
+        with open_output(filename, 'wb') as stream:
+            if compress:
+                svg_file = gzip.open(stream, 'wt', encoding='utf-8')
+            else:
+                svg_file = io.TextIOWrapper(stream, encoding='utf-8')
+            with svg_file:
+                self.write_svg(svg_file)
+
+    def write_svg(self, svg_file):
+        # Everything written is ASCII, so string lengths are byte offsets
+        width, height = f"{self.width:g}", f"{self.height:g}"
+        header = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                  f'viewBox="0 0 {width} {height}">\n')
+        svg_file.write(header)
+        offset = len(header)
+        self.groups = []
+        for rect, bbox in zip(self.rects, self.rect_boxes):
+            self.groups.append((bbox, offset))
+            offset += len(rect)
+        svg_file.writelines(self.rects)
+        for (stroke, stroke_width), path in self.paths.items():
+            if not path["parts"]:
+                continue  # Style only used by filled rectangles
+            self.groups.append((path["bbox"], offset))
+            tail = f'" stroke="{stroke}"'
+            if stroke_width:
+                tail += f' stroke-width="{stroke_width:g}"'
+            tail += ' fill="none"/>\n'
+            svg_file.write('<path d="')
+            svg_file.writelines(path["parts"])
+            svg_file.write(tail)
+            offset += len('<path d="') + sum(map(len, path["parts"])) + len(tail)
+        svg_file.write('</svg>\n')
+
+def svg_filename_for(svg_filename, compress):
+    """Return the file name to write: .svgz instead of .svg when compressing."""
+    if compress and svg_filename.endswith(".svg"):
+        return svg_filename + "z"
+    return svg_filename
+
+def add_drawing(writer, item):
+    """Add the lines, curves and rectangles of one page.get_drawings() entry.
+
+    Returns (paths, rects): whether the drawing added path data and how many
+    filled rectangles it added.
+    """
+    stroke = item.get('color')
+    stroke_width = item.get('width')
+    path = writer.path(stroke, stroke_width)
+    point = writer.point
+    has_path = False
+    rects = 0
+    for shape in item['items']:
+        if shape[0] == 'l':  # Line
+            writer.line_to(path, point(shape[1]), point(shape[2]))
+            has_path = True
+        elif shape[0] == 'c':  # Curve (bezier)
+            writer.add_curve(shape[1], shape[2], shape[3], shape[4], stroke, stroke_width)
+            has_path = True
+        elif shape[0] == 're':  # Rectangle
+            if item.get('fill') is not None:
+                fill_opacity = item.get('fill_opacity')
+                writer.add_rect(shape[1], item['fill'], 1.0 if fill_opacity is None else fill_opacity)
+                rects += 1
+            else:
+                writer.add_rect_outline(shape[1], stroke, stroke_width)
+                has_path = True
+    if has_path and item.get('rect') is not None:
+        writer.cover(path, item['rect'])
+    return has_path, rects
@@ -0,0 +1,174 @@
+import io
+import random
+import fitz  # PyMuPDF
+from PIL import Image
+
+# Synthetic PDFs with the features of our service manuals, generated locally
+# for the benchmarks and the regression suite. Every generator is seeded, so
+# the same PyMuPDF and Pillow versions always produce the same documents.
+
+def jpeg_tile(color, size=160):
+    """Return the bytes of a plain JPEG tile."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+def draw_table(page, x0, y0, rows, cols, cell_w, cell_h, rng, bond_width=1.5, grid_width=0.5, col_widths=None,
+               header=True):
+    """Draw a ruled table with text cells: bond lines around the header row and at the end, grid lines elsewhere.
+
+    `col_widths` gives each column its own width instead of `cell_w`;
+    without `header` the first row holds data like the others.
+    """
+    edges = [x0]
+    for width in col_widths or [cell_w] * cols:
+        edges.append(edges[-1] + width)
+    for r in range(rows + 1):
+        width = bond_width if r in (0, 1, rows) else grid_width
+        page.draw_line(fitz.Point(x0, y0 + r * cell_h), fitz.Point(edges[-1], y0 + r * cell_h), width=width)
+    for x in edges:
+        page.draw_line(fitz.Point(x, y0), fitz.Point(x, y0 + rows * cell_h), width=grid_width)
+    for r in range(rows):
+        for c in range(cols):
+            label = f"H{c + 1}" if r == 0 and header else f"{rng.randint(0, 9999)}"
+            page.insert_text(fitz.Point(edges[c] + 4, y0 + r * cell_h + 13), label, fontsize=8)
+
+def synthetic_table_pdf(pdf_path, page_count, rows=12, cols=5, seed=0):
+    """Write a PDF whose pages carry a header rule, a paragraph and a ruled table with text cells.
+
+    The tables of consecutive pages share their columns and header row, so
+    they read as one table continued over several pages.
+    """
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_number in range(page_count):
+        page = document.new_page(width=595, height=842)
+        page.draw_line(fitz.Point(40, 60), fitz.Point(555, 60), width=1)
+        page.insert_text(fitz.Point(40, 50), f"Service manual - page {page_number + 1}", fontsize=9)
+        page.insert_text(fitz.Point(40, 100), "Lorem ipsum dolor sit amet, consectetur adipiscing elit.", fontsize=9)
+        draw_table(page, 40, 140, rows, cols, 100, 18, rng)
+    document.save(pdf_path)
+    document.close()
+
+def synthetic_spanning_table_pdf(pdf_path, page_count, seed=0):
+    """Write a PDF of ruled tables running over page breaks, one table piece per page.
+
+    Each table spans one to four pages, and its continuation pages repeat
+    the header row half of the time. Every table has the same header text,
+    and the next table keeps the column count but changes the column widths
+    half of the time, so only the column positions tell two tables apart.
+    Returns (tables, rows): how many tables the document holds and how many
+    rows they have once stitched, header rows included once per table.
+    """
+    rng = random.Random(seed)
+    layouts = {3: [(170, 170, 170), (100, 250, 160)], 4: [(130, 130, 130, 120), (80, 200, 120, 110)],
+               5: [(100, 100, 100, 100, 100), (60, 150, 90, 110, 90)]}
+    document = fitz.open()
+    tables = rows = 0
+    remaining, layout = 0, None
+    for page_number in range(page_count):
+        page = document.new_page(width=595, height=842)
+        page.insert_text(fitz.Point(40, 50), f"Parts list - page {page_number + 1}", fontsize=9)
+        if not remaining:
+            cols = len(layout) if layout and rng.random() < 0.5 else rng.choice(sorted(layouts))
+            layout = rng.choice([widths for widths in layouts[cols] if widths != layout])
+            remaining = rng.randint(1, 4)
+            header = True
+            tables += 1
+            rows += 1
+        else:
+            header = rng.random() < 0.5
+        data_rows = rng.randint(4, 30)
+        draw_table(page, 40, 80, data_rows + header, len(layout), 0, 18, rng, col_widths=layout, header=header)
+        rows += data_rows
+        remaining -= 1
+    document.save(pdf_path)
+    document.close()
+    return tables, rows
+
+def synthetic_tiled_image_pdf(pdf_path, page_count, columns=4, rows=3, tile_px=160):
+    """Write a PDF whose pages show one picture built from a grid of separately embedded JPEG tiles."""
+    document = fitz.open()
+    tile_pt = 100
+    for page_number in range(page_count):
+        page = document.new_page(width=595, height=842)
+        for r in range(rows):
+            for c in range(columns):
+                color = ((page_number * 7 + c * 40) % 256, (r * 60) % 256, (c * r * 25) % 256)
+                rect = fitz.Rect(60 + c * tile_pt, 120 + r * tile_pt, 60 + (c + 1) * tile_pt, 120 + (r + 1) * tile_pt)
+                page.insert_image(rect, stream=jpeg_tile(color, tile_px))
+    document.save(pdf_path)
+    document.close()
+
+def synthetic_figure_pdf(pdf_path, page_count, tile_px=64):
+    """Write a PDF whose pages hold two separate tiled figures and one single picture."""
+    document = fitz.open()
+    for page_number in range(page_count):
+        page = document.new_page(width=595, height=842)
+        for ox, oy, rows, cols in ((60, 100, 2, 3), (330, 380, 3, 2)):
+            for r in range(rows):
+                for c in range(cols):
+                    color = ((page_number * 50 + c * 70) % 256, (ox + r * 90) % 256, (oy + c * 40) % 256)
+                    rect = fitz.Rect(ox + c * 60, oy + r * 60, ox + (c + 1) * 60, oy + (r + 1) * 60)
+                    page.insert_image(rect, stream=jpeg_tile(color, tile_px))
+        page.insert_image(fitz.Rect(60, 600, 220, 720), stream=jpeg_tile((200, 180, page_number * 30 % 256), tile_px * 2))
+    document.save(pdf_path)
+    document.close()
+
+def synthetic_banded_pdf(pdf_path, page_count, seed=0):
+    """Write a PDF with running headers and footers, body text, a small table and a mechanical illustration.
+
+    Each page has a header title over a header separator rule, a footer rule
+    over a page number, paragraphs that differ from page to page, a bond and
+    grid line table and a line-and-circle drawing outside the table.
+    """
+    rng = random.Random(seed)
+    words = "valve pump shaft bearing seal gasket flange bolt torque housing rotor stator".split()
+    document = fitz.open()
+    for page_number in range(page_count):
+        page = document.new_page(width=595, height=842)
+        page.insert_text(fitz.Point(40, 45), "A827 maintenance manual", fontsize=10)
+        page.draw_line(fitz.Point(40, 55), fitz.Point(555, 55), width=1)
+        page.draw_line(fitz.Point(40, 800), fitz.Point(555, 800), width=0.5)
+        page.insert_text(fitz.Point(280, 820), f"Page {page_number + 1} of {page_count}", fontsize=8)
+        for line in range(6):
+            text = " ".join(rng.choice(words) for _ in range(10))
+            page.insert_text(fitz.Point(40, 110 + line * 14), text, fontsize=9)
+        draw_table(page, 40, 220, 5, 3, 120, 18, rng)
+        shape = page.new_shape()
+        shape.draw_circle(fitz.Point(420, 560), 60)
+        shape.draw_circle(fitz.Point(420, 560), 20)
+        for angle in range(0, 360, 45):
+            end = fitz.Point(420, 560) + fitz.Point(80, 0) * fitz.Matrix(angle)
+            shape.draw_line(fitz.Point(420, 560), end)
+        shape.finish(color=(0, 0, 0), width=0.8)
+        shape.commit()
+    document.save(pdf_path)
+    document.close()
+
+def synthetic_vector_pdf(pdf_path, page_count, drawings=1500, seed=0):
+    """Write a PDF whose pages carry a large number of separate vector paths: lines, curves and filled rectangles."""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for _ in range(page_count):
+        page = document.new_page(width=595, height=842)
+        shape = page.new_shape()
+        for index in range(drawings):
+            x, y = rng.uniform(40, 540), rng.uniform(80, 780)
+            kind = index % 4
+            if kind == 0:
+                shape.draw_line(fitz.Point(x, y), fitz.Point(x + rng.uniform(-30, 30), y + rng.uniform(-30, 30)))
+                shape.finish(color=(0, 0, 0), width=rng.choice((0.3, 0.6, 1.2)))
+            elif kind == 1:
+                shape.draw_bezier(fitz.Point(x, y), fitz.Point(x + 8, y - 12), fitz.Point(x + 16, y + 12),
+                                  fitz.Point(x + 24, y))
+                shape.finish(color=(0.2, 0.2, 0.6), width=0.5)
+            elif kind == 2:
+                shape.draw_rect(fitz.Rect(x, y, x + rng.uniform(4, 20), y + rng.uniform(4, 20)))
+                shape.finish(color=None, fill=(0.85, 0.85, 0.85))
+            else:
+                shape.draw_polyline([fitz.Point(x, y), fitz.Point(x + 10, y + 4), fitz.Point(x + 14, y + 16)])
+                shape.finish(color=(0.5, 0, 0), width=0.4, closePath=False)
+        shape.commit()
+    document.save(pdf_path)
+    document.close()
@@ -1,141 +1,284 @@
 import os
+import bisect
 import fitz  # PyMuPDF
+import numpy as np
 
-def are_lines_aligned(line1, line2, tolerance=2):
-    """Check if two lines are aligned either horizontally or vertically within a tolerance."""
-    x0_1, y0_1 = line1[1].x, line1[1].y
-    x1_1, y1_1 = line1[2].x, line1[2].y
-    x0_2, y0_2 = line2[1].x, line2[1].y
-    x1_2, y1_2 = line2[2].x, line2[2].y
-
-    horizontal_aligned = abs(y0_1 - y0_2) < tolerance and abs(y1_1 - y1_2) < tolerance
-    vertical_aligned = abs(x0_1 - x0_2) < tolerance and abs(x1_1 - x1_2) < tolerance
-
-    return horizontal_aligned or vertical_aligned
-
-def detect_grid_pattern(lines, min_lines=3):
-    """Detect if a set of lines forms a grid-like pattern."""
-    horizontal_lines = [line for line in lines if abs(line[1].y - line[2].y) < 2]
-    vertical_lines = [line for line in lines if abs(line[1].x - line[2].x) < 2]
-
-    if len(horizontal_lines) >= min_lines and len(vertical_lines) >= min_lines:
-        for h_line in horizontal_lines:
-            aligned_with_many = sum(are_lines_aligned(h_line, other) for other in horizontal_lines) > 1
-            if aligned_with_many:
-                return True
-
-        for v_line in vertical_lines:
-            aligned_with_many = sum(are_lines_aligned(v_line, other) for other in vertical_lines) > 1
-            if aligned_with_many:
-                return True
-
-    return False
-
-def classify_elements(graphics_data, page_height):
-    """Classify elements into vector illustrations and table wireframes based on grid patterns."""
-    vector_elements = []
-    table_elements = []
-    
-    line_items = []
-
-    for item in graphics_data:
-        if 'items' not in item or not item['items']:
+from geometry import PageGeometry, header_rules, outside_body, rects_in_rects, segments_in_rects, split_lines
+from manifest import PageManifest, map_pages_incremental
+from output_sink import drain_outputs
+from page_bands import body_clip, document_bands
+from page_pool import page_count
+import profiling
+from svg_writer import DEFAULT_PRECISION, SvgWriter, add_drawing, svg_filename_for
+
+def merge_collinear(segments, tolerance=2):
+    """Merge sorted (pos, start, end) segments that lie on the same row/column and touch or overlap.
+
+    Tables are often drawn cell by cell, so one ruled row arrives as many short
+    strokes. One sweep over the segments, sorted by position, joins them into
+    full rules.
+    """
+    merged = []
+    for pos, start, end in segments:
+        if merged:
+            last_pos, last_start, last_end = merged[-1]
+            if pos - last_pos < tolerance and start <= last_end + tolerance:
+                merged[-1] = (last_pos, last_start, max(last_end, end))
+                continue
+        merged.append((pos, start, end))
+    return merged
+
+def count_distinct(positions, tolerance=2):
+    """Count positions that differ by at least the tolerance (rows or columns)."""
+    count = 0
+    last = None
+    for pos in sorted(positions):
+        if last is None or pos - last >= tolerance:
+            count += 1
+            last = pos
+    return count
+
+def detect_grid_pattern(lines, min_lines=3, tolerance=2):
+    """Detect table grids formed by (n, 4) line segments and return their rectangles.
+
+    Horizontal and vertical rules are split off with array operations, merged with a sorted sweep, then a sweep
+    over x marks the horizontal rules crossing the current x in a Fenwick
+    tree indexed by their rank in y, so each vertical rule counts and visits
+    the marked rules it touches without shifting a sorted list. The
+    connected rules form candidate tables; a candidate is kept when it has at
+    least `min_lines` distinct rows and columns of rules (2 x 2 cells for the
+    default of 3). Runs in O((n + k) log n) for n segments and k crossings.
+    """
+    horizontal, vertical = split_lines(lines, tolerance)
+    horizontal = merge_collinear(horizontal.tolist(), tolerance)
+    vertical = merge_collinear(vertical.tolist(), tolerance)
+    if len(horizontal) < min_lines or len(vertical) < min_lines:
+        return []
+
+    # Union-find over all rules; horizontals first, then verticals
+    parent = list(range(len(horizontal) + len(vertical)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    # Events sorted by x: horizontal rules open (0), verticals query (1), horizontals close (2)
+    events = []
+    for index, (y, x0, x1) in enumerate(horizontal):
+        events.append((x0 - tolerance, 0, index))
+        events.append((x1 + tolerance, 2, index))
+    for index, (x, y0, y1) in enumerate(vertical):
+        events.append((x, 1, index))
+    events.sort()
+
+    # Fenwick tree over the horizontal rules, which merge_collinear leaves
+    # sorted by y: counts of the rules spanning the sweep position
+    rows = [rule[0] for rule in horizontal]
+    tree = [0] * (len(horizontal) + 1)
+    top = 1 << len(horizontal).bit_length()
+
+    def mark(index, delta):
+        index += 1
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    def count_below(index):
+        """Number of marked rules among the first `index`."""
+        count = 0
+        while index:
+            count += tree[index]
+            index -= index & -index
+        return count
+
+    def nth_marked(rank):
+        """Index of the rank-th (1-based) marked rule."""
+        index, step = 0, top
+        while step:
+            if index + step < len(tree) and tree[index + step] < rank:
+                index += step
+                rank -= tree[index]
+            step >>= 1
+        return index
+
+    for _, kind, index in events:
+        if kind == 0:
+            mark(index, 1)
+        elif kind == 2:
+            mark(index, -1)
+        else:
+            _, y0, y1 = vertical[index]
+            v_node = len(horizontal) + index
+            lo = bisect.bisect_left(rows, y0 - tolerance)
+            hi = bisect.bisect_right(rows, y1 + tolerance)
+            for rank in range(count_below(lo) + 1, count_below(hi) + 1):
+                union(nth_marked(rank), v_node)
+
+    components = {}
+    for node in range(len(parent)):
+        components.setdefault(find(node), []).append(node)
+
+    tables = []
+    for nodes in components.values():
+        rows = [horizontal[n] for n in nodes if n < len(horizontal)]
+        cols = [vertical[n - len(horizontal)] for n in nodes if n >= len(horizontal)]
+        if count_distinct([r[0] for r in rows], tolerance) < min_lines:
+            continue
+        if count_distinct([c[0] for c in cols], tolerance) < min_lines:
             continue
+        x0 = min([r[1] for r in rows] + [c[0] for c in cols])
+        x1 = max([r[2] for r in rows] + [c[0] for c in cols])
+        y0 = min([c[1] for c in cols] + [r[0] for r in rows])
+        y1 = max([c[2] for c in cols] + [r[0] for r in rows])
+        tables.append(fitz.Rect(x0, y0, x1, y1))
 
-        for shape in item['items']:
-            if shape[0] == 'l':  # Line
-                line_items.append((item, shape))
+    tables.sort(key=lambda rect: (rect.y0, rect.x0))
+    return tables
 
-    if detect_grid_pattern([shape for _, shape in line_items]):
-        for item, shape in line_items:
-            table_elements.append(item)
-    else:
-        for item, shape in line_items:
-            vector_elements.append(item)
+# Labels given to each entry of page.get_drawings()
+TABLE_WIREFRAME = "table_wireframe"
+BOND_LINE = "bond_line"
+GRID_LINE = "grid_line"
+HEADER_SEPARATOR = "header_separator"
+VECTOR_ILLUSTRATION = "vector_illustration"
+
+TABLE_LABELS = (TABLE_WIREFRAME, BOND_LINE, GRID_LINE)
+
+def label_drawings(graphics_data, page_width, page_height, bond_ratio=1.5, body=None):
+    """Give every drawing exactly one label, returned as a list aligned with graphics_data.
+
+    The drawings are turned into NumPy arrays once (see PageGeometry) and every
+    test runs on whole arrays. Lines inside a detected table become bond lines
+    when their stroke is at least `bond_ratio` times the thinnest table stroke
+    on the page, otherwise grid lines. Rectangles inside a table are the table
+    wireframe itself. Long single rules near the top of the page are header
+    separators unless they belong to a table. Given the page's `body` clip
+    (see page_bands), drawings above or below it are labelled header
+    separators as well.
+    """
+    with profiling.stage("page_geometry"):
+        geometry = PageGeometry(graphics_data)
+    tables = [tuple(rect) for rect in detect_grid_pattern(geometry.lines)]
+
+    in_table = segments_in_rects(geometry.lines, tables)
+    # A rule of a detected table is never a header separator, however high on the page
+    header = header_rules(geometry, page_width, page_height)
+    header &= geometry.count_per_drawing(geometry.line_drawing, in_table) == 0
+    if body is not None:
+        header |= outside_body(geometry, body.y0, body.y1)
+    # Drawings with any line outside the tables are not part of a table
+    outside = geometry.count_per_drawing(geometry.line_drawing, ~in_table) > 0
+    candidates = (geometry.item_counts > 0) & ~header & ~outside
+    table_lines = candidates & (geometry.count_per_drawing(geometry.line_drawing) == geometry.item_counts)
+    rects_inside = geometry.count_per_drawing(geometry.rect_drawing, rects_in_rects(geometry.rects, tables))
+    wireframe = candidates & ~table_lines & (rects_inside == geometry.item_counts)
+
+    widths = geometry.widths[table_lines]
+    thinnest = widths[widths > 0].min(initial=np.inf)
+    bond = table_lines & (geometry.widths >= thinnest * bond_ratio)
 
-    for item in graphics_data:
-        if item not in table_elements and item not in vector_elements:
-            vector_elements.append(item)
+    labels = np.array([VECTOR_ILLUSTRATION, HEADER_SEPARATOR, BOND_LINE, GRID_LINE, TABLE_WIREFRAME])
+    codes = np.select([header, bond, table_lines, wireframe], [1, 2, 3, 4], 0)
+    return labels[codes].tolist()
 
+def classify_elements(graphics_data, page_width, page_height, body=None):
+    """Classify elements into vector illustrations and table wireframes based on grid patterns.
+
+    Header separators, and anything outside the `body` clip, are left out of
+    both lists.
+    """
+    labels = label_drawings(graphics_data, page_width, page_height, body=body)
+    vector_elements = [item for item, label in zip(graphics_data, labels) if label == VECTOR_ILLUSTRATION]
+    table_elements = [item for item, label in zip(graphics_data, labels) if label in TABLE_LABELS]
     return vector_elements, table_elements
 
-def create_svg_from_elements(elements, svg_filename, page_width, page_height):
+def create_svg_from_elements(elements, svg_filename, page_width, page_height, precision=DEFAULT_PRECISION, compress=False):
     """Generate SVG from given elements."""
-    svg_content = [
-        f'<svg xmlns="http://www.w3.org/2000/svg" width="{page_width}" height="{page_height}" viewBox="0 0 {page_width} {page_height}">'
-    ]
-    
-    elements_added = False
-    
-    for item in elements:
-        path_data = []
-        for shape in item['items']:
-            if shape[0] == 'l':  # Line
-                x0, y0 = shape[1].x, shape[1].y
-                x1, y1 = shape[2].x, shape[2].y
-                path_data.append(f"M{x0} {page_height - y0} L{x1} {page_height - y1}")
-            elif shape[0] == 'c':  # Curve
-                points = shape[1]
-                if len(points) == 4:
-                    path_data.append(
-                        f"M{points[0].x} {page_height - points[0].y} "
-                        f"C{points[1].x} {page_height - points[1].y}, "
-                        f"{points[2].x} {page_height - points[2].y}, "
-                        f"{points[3].x} {page_height - points[3].y}"
-                    )
-            elif shape[0] == 're':  # Rectangle
-                rect = shape[1]
-                x, y, w, h = rect.x0, rect.y0, rect.width, rect.height
-                fill_color = item.get('fill', (0, 0, 0))
-                fill_opacity = item.get('fill_opacity', 1.0)
-                svg_content.append(
-                    f'<rect x="{x}" y="{page_height - y - h}" width="{w}" height="{h}" '
-                    f'fill="rgb({fill_color[0] * 255}, {fill_color[1] * 255}, {fill_color[2] * 255})" '
-                    f'fill-opacity="{fill_opacity}" />'
-                )
-                elements_added = True
-            elif shape[0] in ['s', 'fs']:  # Stroke or filled stroke
-                x0, y0 = shape[1].x, shape[1].y
-                x1, y1 = shape[2].x, shape[2].y
-                path_data.append(f"M{x0} {page_height - y0} L{x1} {page_height - y1}")
-        
-        if path_data:
-            svg_content.append(f'<path d="{" ".join(path_data)}" stroke="black" fill="none" />')
-            elements_added = True
-    
-    svg_content.append('</svg>')
-    
-    if elements_added:
-        with open(svg_filename, 'w') as svg_file:
-            svg_file.write("\n".join(svg_content))
+    writer = build_svg(elements, page_width, page_height, precision)
+    if not writer.is_empty():
+        svg_filename = svg_filename_for(svg_filename, compress)
+        writer.write(svg_filename, compress)
         print(f"SVG file '{svg_filename}' has been created.")
+        return svg_filename
     else:
         print(f"No significant elements found for '{svg_filename}'. The file will not be created.")
+        return None
 
-def main():
-    pdf_path = "/mnt/f/power/gpt/A827AV05.pdf"
-    output_dir = "/mnt/f/power/gpt"
+def build_svg(elements, page_width, page_height, precision=DEFAULT_PRECISION):
+    """Add the drawings in `elements` to a new SvgWriter and return it."""
+    writer = SvgWriter(page_width, page_height, precision)
+    for item in elements:
+        if item.get('items'):
+            add_drawing(writer, item)
+    return writer
+
+def process_page(page, page_number, output_dir, bands=None):
+    """Classify the drawings of one page, write its vector and table wireframe SVGs and return the files written.
+
+    `bands` are the document's header and footer bands from page_bands.
+    """
+    with profiling.stage("get_drawings"):
+        graphics_data = page.get_drawings()
+    profiling.count("drawings", len(graphics_data))
+
+    # Classify elements
+    with profiling.stage("classify_elements"):
+        body = body_clip(bands, page.rect) if bands else None
+        vector_elements, table_elements = classify_elements(graphics_data, page.rect.width, page.rect.height, body)
+
+    # Create SVG for vector illustration
+    vector_svg_filename = os.path.join(output_dir, f"page_{page_number + 1}_vector.svg")
+    vector_svg = create_svg_from_elements(vector_elements, vector_svg_filename, page.rect.width, page.rect.height)
 
+    # Create SVG for table wireframe
+    table_svg_filename = os.path.join(output_dir, f"page_{page_number + 1}_table_wireframe.svg")
+    table_svg = create_svg_from_elements(table_elements, table_svg_filename, page.rect.width, page.rect.height)
+    return [filename for filename in (vector_svg, table_svg) if filename]
+
+def process_document(pdf_path, output_dir, workers=None, incremental=False, low_memory=False):
+    """Process every page of the PDF, spreading pages over `workers` processes.
+
+    With `incremental`, pages unchanged since the last run in `output_dir`
+    are skipped and keep their SVGs. `low_memory` keeps memory flat on very
+    long documents (see map_pages). Returns the number of pages processed.
+    """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    
-    document = fitz.open(pdf_path)
-    for page_number in range(document.page_count):
-        page = document.load_page(page_number)
-        graphics_data = page.get_drawings()
 
-        # Classify elements
-        vector_elements, table_elements = classify_elements(graphics_data, page.rect.height)
-        
-        # Create SVG for vector illustration
-        vector_svg_filename = os.path.join(output_dir, f"page_{page_number + 1}_vector.svg")
-        create_svg_from_elements(vector_elements, vector_svg_filename, page.rect.width, page.rect.height)
-        
-        # Create SVG for table wireframe
-        table_svg_filename = os.path.join(output_dir, f"page_{page_number + 1}_table_wireframe.svg")
-        create_svg_from_elements(table_elements, table_svg_filename, page.rect.width, page.rect.height)
-
-    document.close()
+    pages = page_count(pdf_path)
+    bands = document_bands(pdf_path)
+
+    manifest = None
+    if incremental:
+        manifest = PageManifest(output_dir, {"script": "version_1", "svg_precision": DEFAULT_PRECISION, "bands": bands})
+
+    page_results = map_pages_incremental(pdf_path, range(pages), process_page, (output_dir, bands), workers, manifest,
+                                         low_memory)
+    for page_number, outputs, fingerprint, reused in page_results:
+        if manifest is not None and not reused:
+            manifest.record(page_number, fingerprint, outputs, outputs)
+
+    # Every file must be on disk before the run counts as done
+    drain_outputs()
+    if manifest is not None:
+        manifest.save()
+    return pages
+
+def main():
+    pdf_path = "/mnt/f/power/gpt/A827AV05.pdf"
+    output_dir = "/mnt/f/power/gpt"
+    workers = os.cpu_count()  # Number of page worker processes; 1 runs serially
+    incremental = False  # Skip pages unchanged since the last run in output_dir
+    low_memory = False  # Release page resources eagerly for documents of thousands of pages
+
+    process_document(pdf_path, output_dir, workers=workers, incremental=incremental, low_memory=low_memory)
 
 if __name__ == "__main__":
     main()
@@ -1,138 +1,231 @@
-import fitz  # PyMuPDF
-import pdfplumber
+import csv
 import os
 
-def extract_images_from_page(page, output_dir, page_number):
-    """Extracts images from a given PDF page."""
-    for img_index, img in enumerate(page.get_images(full=True)):
+from image_cache import (DEFAULT_CACHE_LIMITS, LOW_MEMORY_CACHE_LIMITS, ImageCache, fold_images, get_image_cache,
+                         release_image_caches)
+from manifest import PageManifest, map_pages_incremental
+from output_sink import drain_outputs, open_output
+from page_data import read_page, close_plumber_documents
+from page_pool import page_count
+import profiling
+from svg_writer import DEFAULT_PRECISION, SvgWriter, add_drawing, svg_filename_for
+
+def extract_images_from_page(page, output_dir, page_number, image_list=None, cache=None):
+    """Extracts images from a given PDF page and returns their file names.
+
+    Pass the document's ImageCache as `cache` so images repeated on several
+    pages are decoded and written once.
+    """
+    if image_list is None:
+        image_list = page.get_images(full=True)
+    if cache is None:
+        cache = ImageCache()
+    image_files = []
+    for img_index, img in enumerate(image_list):
         xref = img[0]
-        base_image = page.parent.extract_image(xref)
-        image_bytes = base_image["image"]
-        image_ext = base_image["ext"]
-        image_filename = os.path.join(output_dir, f"page_{page_number + 1}_image_{img_index + 1}.{image_ext}")
-        # Save image to file
-        with open(image_filename, "wb") as image_file:
-            image_file.write(image_bytes)
-        print(f"Extracted image: {image_filename}")
-
-def create_svg_from_graphics_data(graphics_data, svg_filename, page_width, page_height):
+        filename_base = os.path.join(output_dir, f"page_{page_number + 1}_image_{img_index + 1}")
+        # Save image to file, or point at the copy already written
+        image_files.append(cache.save_image(page.parent, xref, filename_base))
+    return image_files
+
+def create_svg_from_graphics_data(graphics_data, svg_filename, page_width, page_height, precision=DEFAULT_PRECISION, compress=False):
     """Generate SVG from lines, paths, curves, and filled shapes."""
-    svg_content = [
-        f'<svg xmlns="http://www.w3.org/2000/svg" width="{page_width}" height="{page_height}" viewBox="0 0 {page_width} {page_height}">'
-    ]
-    
-    # Track whether we add any meaningful paths
-    paths_added = False
-    
+    writer = SvgWriter(page_width, page_height, precision)
+
     for item in graphics_data:
         if 'items' not in item or not item['items']:
             continue
-        
+
         try:
-            path_data = []
             if item['type'] in ['l', 'c', 'f']:  # Lines, curves, and filled shapes
-                for shape in item['items']:
-                    if shape[0] == 'l':  # Line
-                        x0, y0 = shape[1].x, shape[1].y
-                        x1, y1 = shape[2].x, shape[2].y
-                        path_data.append(f"M{x0} {page_height - y0} L{x1} {page_height - y1}")
-                    elif shape[0] == 'c':  # Curve (bezier or arc)
-                        points = shape[1]
-                        if len(points) == 4:
-                            path_data.append(
-                                f"M{points[0].x} {page_height - points[0].y} "
-                                f"C{points[1].x} {page_height - points[1].y}, "
-                                f"{points[2].x} {page_height - points[2].y}, "
-                                f"{points[3].x} {page_height - points[3].y}"
-                            )
-                    elif shape[0] == 're':  # Rectangle
-                        rect = shape[1]
-                        x, y, w, h = rect.x0, rect.y0, rect.width, rect.height
-                        fill_color = item.get('fill', (0, 0, 0))
-                        fill_opacity = item.get('fill_opacity', 1.0)
-                        svg_content.append(
-                            f'<rect x="{x}" y="{page_height - y - h}" width="{w}" height="{h}" '
-                            f'fill="rgb({fill_color[0] * 255}, {fill_color[1] * 255}, {fill_color[2] * 255})" '
-                            f'fill-opacity="{fill_opacity}" />'
-                        )
-                        paths_added = True
-                # Only add path if it is not empty
-                if path_data:
-                    paths_added = True
-                    svg_content.append(f'<path d="{" ".join(path_data)}" stroke="black" fill="none" />')
+                add_drawing(writer, item)
             else:
                 # Skip unsupported types
                 continue
-            
+
         except Exception as e:
             print(f"Error processing item {item}: {e}")
-    
-    # Close the SVG content
-    svg_content.append('</svg>')
-    
+
     # Write the SVG content to a file only if paths were added
-    if paths_added:
-        with open(svg_filename, 'w') as svg_file:
-            svg_file.write("\n".join(svg_content))
+    if not writer.is_empty():
+        svg_filename = svg_filename_for(svg_filename, compress)
+        writer.write(svg_filename, compress)
         print(f"SVG file '{svg_filename}' has been created.")
+        return svg_filename
     else:
         print(f"No valid vector graphics found; the SVG file '{svg_filename}' will not be created.")
+        return None
 
-def extract_tables(pdf_path, output_dir, start_page, end_page):
-    """Extract tables from a range of pages and combine multi-page tables."""
-    combined_table = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_number in range(start_page, end_page + 1):
-            page = pdf.pages[page_number]
-            tables = page.extract_tables()
-            if not tables:
-                print(f"No tables found on page {page_number + 1}.")
-                continue
-            for table in tables:
-                # If the table is a continuation of a previous table, merge it
-                if combined_table and len(combined_table[-1]) > 0 and len(table) > 0:
-                    combined_table.extend(table[1:])  # Skip header row
-                else:
-                    combined_table.extend(table)
-
-        # Save the combined table to a CSV file if it is not empty
-        if combined_table:
-            csv_filename = os.path.join(output_dir, f'combined_table_{start_page + 1}_to_{end_page + 1}.csv')
-            with open(csv_filename, 'w') as csv_file:
-                for row in combined_table:
-                    merged_row = [str(cell).replace("\n", " ") if cell is not None else "" for cell in row]
-                    csv_file.write(",".join(merged_row) + "\n")
-            print(f"Combined table saved to {csv_filename}")
+def iter_page_tables(page_results):
+    """Yield (page_number, table, column boundaries) for every table in (page_number, tables, columns) results."""
+    for page_number, tables, columns in page_results:
+        if not tables:
+            print(f"No tables found on page {page_number + 1}.")
+            continue
+        for table, edges in zip(tables, columns):
+            if table:
+                yield page_number, table, edges
+
+def columns_match(edges, other, tolerance=2):
+    """Check whether two tables have the same column boundaries, within `tolerance` points.
+
+    Tables whose boundaries are unknown (None) match anything.
+    """
+    if edges is None or other is None:
+        return True
+    return len(edges) == len(other) and all(abs(a - b) <= tolerance for a, b in zip(edges, other))
+
+def merge_continuations(page_tables, lookback=1, tolerance=2):
+    """Yield (starts_new_table, rows) pieces, merging tables continued across page breaks.
+
+    `page_tables` yields (page_number, rows, column boundaries) in page
+    order. A table continues the previous one when it is the first table on
+    a page at most `lookback` pages after it, has the same number of columns
+    and its column boundaries line up with the previous piece's within
+    `tolerance` points (see columns_match); a repeated header row is then
+    dropped. Only the previous piece's page, column count, boundaries and
+    the table's header are kept, so each page break is decided in constant
+    time and memory does not grow with the document.
+    """
+    previous = None  # (page_number, column count, column boundaries, header row) of the last piece
+    for page_number, table, edges in page_tables:
+        columns = len(table[0])
+        if (previous is not None
+                and 0 < page_number - previous[0] <= lookback
+                and columns == previous[1]
+                and columns_match(edges, previous[2], tolerance)):
+            profiling.count("tables_stitched")
+            yield False, table[1:] if table[0] == previous[3] else table
+            previous = (page_number, columns, edges, previous[3])
         else:
-            print(f"No combined table data found for pages {start_page + 1} to {end_page + 1}.")
+            yield True, table
+            previous = (page_number, columns, edges, table[0])
+
+def clean_row(row):
+    """Flatten line breaks in cells and turn empty cells into empty strings."""
+    return [str(cell).replace("\n", " ") if cell is not None else "" for cell in row]
+
+def write_tables_csv(pieces, csv_filename):
+    """Write table pieces to CSV as they arrive, with a blank line between tables.
+
+    The file is only created once the first table arrives. Returns the number
+    of tables written.
+    """
+    csv_file = None
+    table_count = 0
+    try:
+        for starts_new_table, rows in pieces:
+            if csv_file is None:
+                csv_file = open_output(csv_filename, 'w', newline='')
+                writer = csv.writer(csv_file, lineterminator="\n")
+            if starts_new_table:
+                if table_count:
+                    writer.writerow([])  # Blank line between tables
+                table_count += 1
+            with profiling.stage("csv_write"):
+                writer.writerows(clean_row(row) for row in rows)
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    return table_count
+
+def extract_tables(page_results, output_dir, start_page, end_page):
+    """Stream the tables of a page range, given as (page_number, tables) in page order, to one CSV."""
+    csv_filename = os.path.join(output_dir, f'combined_table_{start_page + 1}_to_{end_page + 1}.csv')
+    table_count = write_tables_csv(merge_continuations(iter_page_tables(page_results)), csv_filename)
+    if table_count:
+        print(f"Combined table saved to {csv_filename}")
+    else:
+        print(f"No combined table data found for pages {start_page + 1} to {end_page + 1}.")
+
+def process_page(page, page_number, output_dir, cache_limits=DEFAULT_CACHE_LIMITS):
+    """Extract the images, vector SVG and tables of one page from a single parse.
+
+    `cache_limits` bounds the document image cache as (max images, max
+    bytes). Returns the images written, their digests (file name -> SHA-1),
+    the SVG written or None, the page's tables and their column boundaries.
+    """
+    data = read_page(page, page_number, parts=("drawings", "tables", "images"))
+
+    # Extract images from the page
+    cache = get_image_cache(page.parent, output_dir, *cache_limits)
+    images = extract_images_from_page(page, output_dir, page_number, data["images"], cache)
+    digests = {filename: cache.digests[filename] for filename in images if filename in cache.digests}
+
+    # Create SVG from the graphics data
+    output_svg = os.path.join(output_dir, f"page_{page_number + 1}_vector.svg")
+    svg_path = create_svg_from_graphics_data(data["drawings"], output_svg, data["width"], data["height"])
+
+    # Tables go back to the parent, which combines them in page order
+    return images, digests, svg_path, data["tables"], data["table_columns"]
+
+def record_pages(page_results, manifest, canonical_images):
+    """Fold repeated images onto their first copy, record fresh pages and yield each page's tables.
+
+    Yields (page_number, tables, column boundaries). Results arrive in page
+    order whatever the worker count; images written by more than one worker
+    are folded onto the earliest page's copy, using the `canonical_images`
+    dict (digest -> file) across pages, so the files written do not depend
+    on the number of workers.
+    """
+    for page_number, result, fingerprint, reused in page_results:
+        images, digests, svg_path, tables, columns = result
+        images, digests, written = fold_images(images, digests, canonical_images)
+        if manifest is not None and not reused:
+            outputs = images + ([svg_path] if svg_path else [])
+            manifest.record(page_number, fingerprint, outputs, [images, digests, svg_path, tables, columns],
+                            written + ([svg_path] if svg_path else []))
+        yield page_number, tables, columns
+
+def process_document(pdf_path, output_dir, start_page=0, end_page=None, workers=None, incremental=False,
+                     low_memory=False):
+    """Process a page range, spreading the page work over `workers` processes.
+
+    `end_page` defaults to the last page of the document. With `incremental`,
+    pages unchanged since the last run in `output_dir` keep their images and
+    SVG, and their tables come from the saved fragments. `low_memory` keeps
+    memory flat on very long documents (see map_pages) and caps the image
+    cache at LOW_MEMORY_CACHE_LIMITS. Returns the number of pages processed.
+    """
+    # Ensure output directory exists
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    if end_page is None:
+        end_page = page_count(pdf_path) - 1
+
+    manifest = None
+    if incremental:
+        # Bumped whenever the page fragment layout changes, so older fragments are not reused
+        manifest = PageManifest(output_dir, {"script": "version_2", "svg_precision": DEFAULT_PRECISION,
+                                             "fragment_layout": 2})
+
+    # Extract images, graphics data and tables page by page; tables are
+    # written to the combined CSV as each page's results come back
+    page_numbers = range(start_page, end_page + 1)
+    cache_limits = LOW_MEMORY_CACHE_LIMITS if low_memory else DEFAULT_CACHE_LIMITS
+    page_results = map_pages_incremental(pdf_path, page_numbers, process_page, (output_dir, cache_limits), workers,
+                                         manifest, low_memory)
+    extract_tables(record_pages(page_results, manifest, {}), output_dir, start_page, end_page)
+    close_plumber_documents()
+    release_image_caches()
+
+    # Every file must be on disk before the run counts as done
+    drain_outputs()
+    if manifest is not None:
+        manifest.save()
+    return end_page - start_page + 1
 
 def main():
     pdf_path = "/mnt/f/power/gpt/A827AV05.pdf"
     output_dir = "/mnt/f/power/gpt"
     start_page = 0  # Page index starts from 0
-    end_page = 12    # Last page index to include in table extraction
+    end_page = None  # Last page index to include; None runs to the end of the document
+    workers = os.cpu_count()  # Number of page worker processes; 1 runs serially
+    incremental = False  # Skip pages unchanged since the last run in output_dir
+    low_memory = False  # Release page resources eagerly for documents of thousands of pages
 
-    # Ensure output directory exists
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    # Load the PDF and extract images and graphics data
-    document = fitz.open(pdf_path)
-    for page_number in range(start_page, end_page + 1):
-        page = document.load_page(page_number)
-        graphics_data = page.get_drawings()
-        
-        # Extract images from the page
-        extract_images_from_page(page, output_dir, page_number)
-        
-        # Create SVG from the graphics data
-        output_svg = os.path.join(output_dir, f"page_{page_number + 1}_vector.svg")
-        create_svg_from_graphics_data(graphics_data, output_svg, page.rect.width, page.rect.height)
-    
-    # Extract and combine tables across multiple pages
-    extract_tables(pdf_path, output_dir, start_page, end_page)
-    
-    document.close()
+    process_document(pdf_path, output_dir, start_page, end_page, workers, incremental, low_memory)
 
 if __name__ == "__main__":
     main()
@@ -1,231 +1,431 @@
 import fitz  # PyMuPDF
-import pdfplumber
+import bisect
+import heapq
+import io
 import os
+import re
 from PIL import Image
 
-def combine_images(images, output_path):
-    """Combine multiple images into one."""
-    if not images:
-        print("No images to combine.")
-        return None
-    
-    # Open images and find the total width and max height
-    image_objects = [Image.open(image) for image in images]
-    if not image_objects:
-        print("Image list is empty, cannot combine.")
-        return None
-    
-    widths, heights = zip(*(i.size for i in image_objects))
-    
-    # Create a new image with the combined width and total height
-    total_width = max(widths)
-    total_height = sum(heights)
-    combined_image = Image.new('RGB', (total_width, total_height))
+from image_cache import (DEFAULT_CACHE_LIMITS, LOW_MEMORY_CACHE_LIMITS, ImageCache, fold_images, get_image_cache,
+                         release_image_caches)
+from manifest import PageManifest, map_pages_incremental
+from output_sink import drain_outputs, open_output
+from page_bands import body_clip, document_bands
+from page_data import read_page
+from page_pool import page_count
+import profiling
+from sidecar import Sidecar, page_rows
+from svg_writer import DEFAULT_PRECISION, SvgWriter, add_drawing, svg_filename_for
+
+def decode_image(document, xref, image_bytes):
+    """Decode extracted image bytes in memory, using a PyMuPDF pixmap for formats PIL cannot read."""
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+        return image
+    except Exception:
+        pix = fitz.Pixmap(document, xref)
+        if pix.colorspace and pix.colorspace.n != 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        mode = "RGBA" if pix.alpha else "RGB"
+        return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+def combine_images(document, fragments, output_path, cache):
+    """Combine image fragments into one image, placing each at its position on the page."""
+    with profiling.stage("composite"):
+        return composite_images(document, fragments, output_path, cache)
+
+def composite_images(document, placed, output_path, cache):
+    """Paste placed fragments onto one canvas and save it through the cache."""
+    # The canvas covers the union of the fragments' page rectangles, at the
+    # resolution of the largest fragment; a tiny fragment with many pixels
+    # must not blow it up, nor may it pass Pillow's decompression bomb limit
+    bounds = fitz.Rect(placed[0]["rect"])
+    for fragment in placed[1:]:
+        bounds |= fragment["rect"]
+    decoded = []
+    for fragment in placed:
+        image_bytes = cache.extract_image(document, fragment["xref"])["image"]
+        decoded.append((decode_image(document, fragment["xref"], image_bytes), fragment["rect"]))
+    image, rect = max(decoded, key=lambda pair: pair[1].width * pair[1].height)
+    scale = image.width / rect.width if rect.width > 0 else 1
+    if Image.MAX_IMAGE_PIXELS and bounds.width * bounds.height * scale ** 2 > Image.MAX_IMAGE_PIXELS:
+        scale = (Image.MAX_IMAGE_PIXELS / (bounds.width * bounds.height)) ** 0.5
+    canvas_size = (max(1, round(bounds.width * scale)), max(1, round(bounds.height * scale)))
+    combined_image = Image.new('RGB', canvas_size, 'white')
 
     # Paste images into the combined image
-    y_offset = 0
-    for im in image_objects:
-        combined_image.paste(im, (0, y_offset))
-        y_offset += im.height
-
-    # Save the combined image
-    combined_image.save(output_path)
-    print(f"Combined image saved as {output_path}")
-
-    # Close image objects
-    for im in image_objects:
-        im.close()
-
-    return output_path
-
-def should_combine_images(image_positions, max_distance=50):
-    """Determine if images should be combined based on their positions."""
-    if len(image_positions) < 2:
-        return False  # No need to combine if there are fewer than two images
-    
-    # Calculate distances between consecutive images
-    distances = [abs(image_positions[i + 1] - image_positions[i]) for i in range(len(image_positions) - 1)]
-    # Check if all distances are below the threshold
-    return all(distance <= max_distance for distance in distances)
-
-def combine_or_keep_images(images, positions, output_dir, page_number):
-    """Combine images if they are close enough, otherwise keep them separate."""
-    if should_combine_images(positions):
-        combined_image_path = os.path.join(output_dir, f"page_{page_number + 1}_combined_image.jpg")
-        result = combine_images(images, combined_image_path)
-        if result:
-            for image in images:
-                os.remove(image)  # Remove the small images after combining
-            return [combined_image_path]
-        else:
-            return images  # If combining failed, keep separate
+    for image, rect in decoded:
+        size = (max(1, round(rect.width * scale)), max(1, round(rect.height * scale)))
+        tile = image.convert('RGB')
+        if tile.size != size:
+            tile = tile.resize(size)
+        combined_image.paste(tile, (round((rect.x0 - bounds.x0) * scale), round((rect.y0 - bounds.y0) * scale)))
+        image.close()
+
+    # Save the combined image, unless the same picture was already saved for another page
+    buffer = io.BytesIO()
+    combined_image.save(buffer, 'JPEG')
+    saved_path = cache.write(output_path, buffer.getvalue())
+    if saved_path == output_path:
+        print(f"Combined image saved as {output_path}")
     else:
-        # Keep images separate
-        return images
-        
-def extract_images_from_page(page, output_dir, page_number):
-    """Extract images from a given PDF page."""
-    images = []
-    image_positions = []
-    for img_index, img in enumerate(page.get_images(full=True)):
+        print(f"Combined image for {output_path} is identical to {saved_path}")
+    return saved_path
+
+def cluster_rects(rects, max_gap=3):
+    """Group rectangles that touch or lie within `max_gap` points of each other.
+
+    Returns lists of indices into `rects`, each sorted and the lists ordered
+    by their first index. A sweep over x keeps the rectangles still within
+    reach of the sweep position in a segment tree indexed by their rank in
+    y0, holding the furthest bottom edge below each node, so each rectangle
+    descends only into the nodes holding a rectangle it touches, and
+    touching rectangles are joined with union-find. Runs in
+    O((n + k) log n) for k neighbouring pairs however tall the rectangles,
+    so pages tiled with hundreds of fragments stay cheap.
+    """
+    parent = list(range(len(rects)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    order = sorted(range(len(rects)), key=lambda i: (rects[i].y0, i))
+    tops = [rects[i].y0 for i in order]
+    rank = [0] * len(rects)
+    for position, i in enumerate(order):
+        rank[i] = position
+    size = 1 << max(len(rects) - 1, 0).bit_length()
+    # Furthest y1 + max_gap of the active rectangles below each node, and each node's first leaf
+    reach = [-float("inf")] * (2 * size)
+    first = [0] * size + list(range(size, 2 * size))
+    for node in range(size - 1, 0, -1):
+        first[node] = first[2 * node]
+
+    expiry = []  # heap of (x1, index) of the active rectangles
+    for i in sorted(range(len(rects)), key=lambda i: rects[i].x0):
+        rect = rects[i]
+        while expiry and expiry[0][0] + max_gap < rect.x0:
+            _, j = heapq.heappop(expiry)
+            node = rank[j] + size
+            reach[node] = -float("inf")
+            node >>= 1
+            while node:
+                value = max(reach[2 * node], reach[2 * node + 1])
+                if reach[node] == value:
+                    break
+                reach[node] = value
+                node >>= 1
+        # Descend into the active rectangles starting above rect.y1 + max_gap and reaching down to rect.y0
+        top = rect.y0
+        end = bisect.bisect_right(tops, rect.y1 + max_gap) + size
+        stack = [1] if end > size and reach[1] >= top else []
+        while stack:
+            node = stack.pop()
+            if node >= size:
+                root_i, root_j = find(i), find(order[node - size])
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+                continue
+            node <<= 1
+            if reach[node] >= top:
+                stack.append(node)
+            node += 1
+            if reach[node] >= top and first[node] < end:
+                stack.append(node)
+        node = rank[i] + size
+        reach_i = rect.y1 + max_gap
+        while node and reach[node] < reach_i:
+            reach[node] = reach_i
+            node >>= 1
+        heapq.heappush(expiry, (rect.x1, i))
+
+    clusters = {}
+    for i in range(len(rects)):
+        clusters.setdefault(find(i), []).append(i)
+    return sorted(clusters.values())
+
+def save_figures(document, fragments, output_dir, page_number, cache, max_gap=3, boxes=None):
+    """Write one composite per cluster of touching fragments and every other image as it is.
+
+    Fragments without a placement on the page are saved on their own. Files
+    are returned in the order of each figure's first fragment on the page;
+    with a `boxes` list, the page rectangle each file covers (None when
+    unplaced) is appended to it in the same order.
+    """
+    placed = [index for index, fragment in enumerate(fragments) if fragment["rect"] is not None]
+    groups = [[placed[i] for i in cluster] for cluster in cluster_rects([fragments[i]["rect"] for i in placed], max_gap)]
+    groups += [[index] for index, fragment in enumerate(fragments) if fragment["rect"] is None]
+    groups.sort()
+
+    figure_count = sum(1 for group in groups if len(group) > 1)
+    saved = []
+    figure_number = 0
+    for group in groups:
+        if boxes is not None:
+            bbox = None
+            for index in group:
+                if fragments[index]["rect"] is not None:
+                    bbox = fitz.Rect(fragments[index]["rect"]) if bbox is None else bbox | fragments[index]["rect"]
+            boxes.append(tuple(bbox) if bbox is not None else None)
+        if len(group) == 1:
+            fragment = fragments[group[0]]
+            saved.append(cache.save_image(document, fragment["xref"], fragment["filename_base"]))
+            continue
+        figure_number += 1
+        suffix = f"_{figure_number}" if figure_count > 1 else ""
+        combined_image_path = os.path.join(output_dir, f"page_{page_number + 1}_combined_image{suffix}.jpg")
+        saved.append(combine_images(document, [fragments[index] for index in group], combined_image_path, cache))
+    return saved
+
+# An XObject drawn by a page content stream: /Name Do
+XOBJECT_DRAW = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s*Do\b")
+
+def image_placements(page, image_list):
+    """Return {xref: first non-empty page rectangle the image is drawn at} for the images in `image_list`.
+
+    When every image is drawn straight from the page's content stream, the
+    images its Do operators name line up one to one with the placements
+    get_image_info() lists, so one pass finds them without decoding any
+    image. Otherwise (images inside forms, inline images) PyMuPDF matches
+    placements to xrefs by decoding and hashing each image.
+    """
+    names = {img[7]: img[0] for img in image_list if img[-1] == 0}
+    pairs = None
+    if len(names) == len(image_list):
+        drawn = [names[name] for name in
+                 (match.decode("latin-1") for match in XOBJECT_DRAW.findall(page.read_contents())) if name in names]
+        infos = page.get_image_info()
+        if len(drawn) == len(infos):
+            pairs = zip(drawn, infos)
+    if pairs is None:
+        pairs = ((info["xref"], info) for info in page.get_image_info(xrefs=True))
+    placements = {}
+    for xref, info in pairs:
+        rect = fitz.Rect(info["bbox"])
+        if xref not in placements and not rect.is_empty:
+            placements[xref] = rect
+    return placements
+
+def extract_images_from_page(page, output_dir, page_number, image_list=None, cache=None, boxes=None):
+    """Extract images from a given PDF page.
+
+    Pass the document's ImageCache as `cache` so images repeated on several
+    pages are decoded and written once; by default each call starts empty.
+    `boxes` collects the page rectangle of each file (see save_figures).
+    """
+    if image_list is None:
+        image_list = page.get_images(full=True)
+    if cache is None:
+        cache = ImageCache()
+    placements = image_placements(page, image_list) if image_list else {}
+    fragments = []
+    for img_index, img in enumerate(image_list):
         xref = img[0]
-        base_image = page.parent.extract_image(xref)
-        image_bytes = base_image["image"]
-        image_ext = base_image["ext"]
-        image_filename = os.path.join(output_dir, f"page_{page_number + 1}_image_{img_index + 1}.{image_ext}")
-        # Save image to file
-        with open(image_filename, "wb") as image_file:
-            image_file.write(image_bytes)
-        images.append(image_filename)
-        # Record the image's vertical position on the page
-        image_positions.append(img[2])  # Assuming vertical position is at index 2 in the image tuple
-        print(f"Extracted image: {image_filename}")
-    
-    # Combine or keep images based on their positions
-    if images:
-        final_images = combine_or_keep_images(images, image_positions, output_dir, page_number)
-        return final_images
+        fragments.append({
+            "xref": xref,
+            "filename_base": os.path.join(output_dir, f"page_{page_number + 1}_image_{img_index + 1}"),
+            "rect": placements.get(xref),
+        })
+
+    # Composite each cluster of touching fragments into one figure
+    if fragments:
+        return save_figures(page.parent, fragments, output_dir, page_number, cache, boxes=boxes)
     else:
         print(f"No images found on page {page_number + 1}.")
         return []
 
-def create_svg_from_graphics_data(graphics_data, svg_filename, page_width, page_height, min_paths=5, min_elements=3):
-    """Generate SVG from lines, paths, curves, and filled shapes."""
-    svg_content = [
-        f'<svg xmlns="http://www.w3.org/2000/svg" width="{page_width}" height="{page_height}" viewBox="0 0 {page_width} {page_height}">'
-    ]
-    
+def create_svg_from_graphics_data(graphics_data, svg_filename, page_width, page_height, min_paths=5, min_elements=3,
+                                  precision=DEFAULT_PRECISION, compress=False, groups=None):
+    """Generate SVG from lines, paths, curves, and filled shapes.
+
+    With a `groups` list, the (page bbox, byte offset) of every element
+    written is appended to it (see SvgWriter).
+    """
+    writer, path_count, element_count = build_svg(graphics_data, page_width, page_height, precision)
+
+    # Write the SVG content to a file only if there are enough paths and elements
+    if path_count >= min_paths and element_count >= min_elements:
+        svg_filename = svg_filename_for(svg_filename, compress)
+        writer.write(svg_filename, compress)
+        if groups is not None:
+            groups.extend(writer.groups)
+        print(f"SVG file '{svg_filename}' has been created with {path_count} paths and {element_count} elements.")
+        return svg_filename
+    else:
+        print(f"No significant vector graphics found; the SVG file '{svg_filename}' will not be created.")
+        return None
+
+def build_svg(graphics_data, page_width, page_height, precision=DEFAULT_PRECISION):
+    """Add the lines, curves and filled shapes of a page to an SvgWriter; return (writer, paths, elements)."""
+    writer = SvgWriter(page_width, page_height, precision)
+
+    # Counted per drawing, before paths sharing a stroke style are merged
     path_count = 0
     element_count = 0
-    
+
     for item in graphics_data:
         if 'items' not in item or not item['items']:
             continue
-        
+
         try:
-            path_data = []
             if item['type'] in ['l', 'c', 'f']:  # Lines, curves, and filled shapes
-                for shape in item['items']:
-                    if shape[0] == 'l':  # Line
-                        x0, y0 = shape[1].x, shape[1].y
-                        x1, y1 = shape[2].x, shape[2].y
-                        path_data.append(f"M{x0} {page_height - y0} L{x1} {page_height - y1}")
-                    elif shape[0] == 'c':  # Curve (bezier or arc)
-                        points = shape[1]
-                        if len(points) == 4:
-                            path_data.append(
-                                f"M{points[0].x} {page_height - points[0].y} "
-                                f"C{points[1].x} {page_height - points[1].y}, "
-                                f"{points[2].x} {page_height - points[2].y}, "
-                                f"{points[3].x} {page_height - points[3].y}"
-                            )
-                    elif shape[0] == 're':  # Rectangle
-                        rect = shape[1]
-                        x, y, w, h = rect.x0, rect.y0, rect.width, rect.height
-                        fill_color = item.get('fill', (0, 0, 0))
-                        fill_opacity = item.get('fill_opacity', 1.0)
-                        svg_content.append(
-                            f'<rect x="{x}" y="{page_height - y - h}" width="{w}" height="{h}" '
-                            f'fill="rgb({fill_color[0] * 255}, {fill_color[1] * 255}, {fill_color[2] * 255})" '
-                            f'fill-opacity="{fill_opacity}" />'
-                        )
-                        path_count += 1
-                        element_count += 1
-                # Only add path if it is not empty
-                if path_data:
-                    svg_content.append(f'<path d="{" ".join(path_data)}" stroke="black" fill="none" />')
-                    path_count += 1
-                    element_count += 1
+                has_path, rects = add_drawing(writer, item)
+                path_count += rects + has_path
+                element_count += rects + has_path
             else:
                 continue
-            
+
         except Exception as e:
             print(f"Error processing item {item}: {e}")
-    
-    # Close the SVG content
-    svg_content.append('</svg>')
-    
-    # Write the SVG content to a file only if there are enough paths and elements
-    if path_count >= min_paths and element_count >= min_elements:
-        with open(svg_filename, 'w') as svg_file:
-            svg_file.write("\n".join(svg_content))
-        print(f"SVG file '{svg_filename}' has been created with {path_count} paths and {element_count} elements.")
-        return svg_filename
-    else:
-        print(f"No significant vector graphics found; the SVG file '{svg_filename}' will not be created.")
-        return None
+    return writer, path_count, element_count
+
+def clean_text(text):
+    """Return a page's text as content.txt holds it, without blank lines."""
+    # Header and footer bands were clipped off when the text was read
+    return "\n".join(line for line in (text or "").splitlines() if line.strip())
+
+def page_content(text, images, svg_path):
+    """Return the content.txt pieces of one page: its text, then references to its images and SVG."""
+    pieces = [clean_text(text)]
+    pieces += [f"\n{image_file}\n" for image_file in images]
+    if svg_path:
+        pieces.append(f"\n{svg_path}\n")
+    return pieces
+
+def extract_text_and_embed_assets(pages, output_dir, sidecar=None):
+    """Write content.txt from (page_number, text, images, svg_path, sidecar rows) per page, in page order.
 
-def extract_text_and_embed_assets(pdf_path, output_dir, start_page, end_page, images, tables, svgs):
-    """Extract text from the PDF and embed references to images, tables, and SVGs."""
-    content = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_number in range(start_page, end_page + 1):
-            page = pdf.pages[page_number]
-            text = page.extract_text()
-            if not text:
-                text = ""
-            
-            # Remove header content if possible
-            lines = text.splitlines()
-            filtered_text = "\n".join(line for line in lines if line.strip())
-            
-            # Add content for the current page
-            content.append(filtered_text)
-            
-            # Embed table references
-            if page_number in tables:
-                for table_file in tables[page_number]:
-                    content.append(f"\n{table_file}\n")
-            
-            # Embed image references
-            if page_number in images:
-                for image_file in images[page_number]:
-                    content.append(f"\n{image_file}\n")
-            
-            # Embed SVG references
-            if page_number in svgs:
-                content.append(f"\n{svgs[page_number]}\n")
-
-    # Save the combined content to a text file
+    Each page is written as it arrives, so the text of the whole document is
+    never held in memory; pieces are separated by blank lines. With a
+    `sidecar`, each page's rows are added to it at the byte offset where the
+    page's text starts.
+    """
     txt_filename = os.path.join(output_dir, "content.txt")
-    with open(txt_filename, "w") as txt_file:
-        txt_file.write("\n\n".join(content))
+    with open_output(txt_filename, "w") as txt_file:
+        separator = ""
+        position = 0  # Bytes written so far
+        for page_number, text, images, svg_path, rows in pages:
+            with profiling.stage("write_content"):
+                for index, piece in enumerate(page_content(text, images, svg_path)):
+                    if sidecar is not None:
+                        if index == 0:
+                            sidecar.add_page(page_number, rows or [], position + len(separator))
+                        position += len((separator + piece).encode("utf-8"))
+                    txt_file.write(separator + piece)
+                    separator = "\n\n"
     print(f"Text content with embedded references saved to {txt_filename}")
 
+def process_page(page, page_number, output_dir, cache_limits=DEFAULT_CACHE_LIMITS, bands=None, sidecar=False):
+    """Extract the images, vector SVG and text of one page from a single parse.
+
+    `cache_limits` bounds the document image cache as (max images, max bytes).
+    Text inside the document's header and footer `bands` is left out. With
+    `sidecar`, the page's sidecar rows (see sidecar.page_rows) are returned
+    too, otherwise None.
+    """
+    clip = body_clip(bands, page.rect) if bands else None
+    data = read_page(page, page_number, parts=("drawings", "text", "images"), clip=clip)
+
+    # Extract images, re-using files already written for earlier pages
+    cache = get_image_cache(page.parent, output_dir, *cache_limits)
+    boxes = [] if sidecar else None
+    extracted_images = extract_images_from_page(page, output_dir, page_number, data["images"], cache, boxes)
+    digests = {filename: cache.digests[filename] for filename in extracted_images if filename in cache.digests}
+
+    # Create SVGs
+    svg_filename = os.path.join(output_dir, f"page_{page_number + 1}_vector.svg")
+    groups = [] if sidecar else None
+    svg_path = create_svg_from_graphics_data(data["drawings"], svg_filename, data["width"], data["height"], groups=groups)
+
+    rows = None
+    if sidecar:
+        rows = page_rows(page, clean_text(data["text"]), clip, extracted_images, boxes, svg_path, groups)
+    return extracted_images, digests, svg_path, data["text"], rows
+
+def record_pages(page_results, manifest, canonical_images):
+    """Fold repeated images onto their first copy, record fresh pages and yield each page's content.
+
+    Yields (page_number, text, images, svg_path, sidecar rows). Results
+    arrive in page order whatever the worker count; images written by more
+    than one worker are folded onto the earliest page's copy, using the
+    `canonical_images` dict (digest -> file) across pages.
+    """
+    for page_number, result, fingerprint, reused in page_results:
+        extracted_images, digests, svg_path, text, rows = result
+        final_images, digests, written = fold_images(extracted_images, digests, canonical_images)
+        renamed = {original: final for original, final in zip(extracted_images, final_images) if original != final}
+        if renamed and rows:
+            rows = [[kind, bbox, offset, renamed.get(filename, filename)] for kind, bbox, offset, filename in rows]
+        extracted_images = final_images
+        if manifest is not None and not reused:
+            outputs = extracted_images + ([svg_path] if svg_path else [])
+            manifest.record(page_number, fingerprint, outputs, [extracted_images, digests, svg_path, text, rows],
+                            written + ([svg_path] if svg_path else []))
+        yield page_number, text, extracted_images, svg_path, rows
+
+def process_document(pdf_path, output_dir, start_page=0, end_page=None, workers=None,
+                     cache_limits=DEFAULT_CACHE_LIMITS, incremental=False, low_memory=False, sidecar=False):
+    """Process a page range, spreading the page work over `workers` processes.
+
+    `end_page` defaults to the last page of the document. With `incremental`,
+    pages unchanged since the last run in `output_dir` keep their images and
+    SVG, and content.txt is rebuilt from the saved per-page fragments.
+    `low_memory` keeps memory flat on very long documents (see map_pages)
+    and caps the image cache at LOW_MEMORY_CACHE_LIMITS. With `sidecar`, an
+    index of every text block, table cell, image and vector group is written
+    next to content.txt (see sidecar.Sidecar). Returns the number of pages
+    processed.
+    """
+    # Ensure output directory exists
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    if end_page is None:
+        end_page = page_count(pdf_path) - 1
+    bands = document_bands(pdf_path)
+
+    if low_memory:
+        cache_limits = tuple(min(limit, low) for limit, low in zip(cache_limits, LOW_MEMORY_CACHE_LIMITS))
+
+    # The manifest records the limits the pages actually run with
+    manifest = None
+    if incremental:
+        settings = {"script": "version_3", "svg_precision": DEFAULT_PRECISION, "cache_limits": list(cache_limits),
+                    "bands": bands, "sidecar": sidecar}
+        manifest = PageManifest(output_dir, settings)
+
+    # Pages stream from the workers straight into content.txt
+    page_numbers = range(start_page, end_page + 1)
+    page_results = map_pages_incremental(pdf_path, page_numbers, process_page, (output_dir, cache_limits, bands, sidecar),
+                                         workers, manifest, low_memory)
+    index = Sidecar(output_dir, os.path.join(output_dir, "content.txt")) if sidecar else None
+    extract_text_and_embed_assets(record_pages(page_results, manifest, {}), output_dir, index)
+    release_image_caches()
+    if index is not None:
+        index.save()
+
+    # Every file must be on disk before the run counts as done
+    drain_outputs()
+    if manifest is not None:
+        manifest.save()
+    return end_page - start_page + 1
+
 def main():
     pdf_path = "/mnt/f/power/gpt/A827AV05.pdf"
     output_dir = "/mnt/f/power/gpt"
     start_page = 0
-    end_page = 12
+    end_page = None  # None runs to the end of the document
+    workers = os.cpu_count()  # Number of page worker processes; 1 runs serially
+    incremental = False  # Skip pages unchanged since the last run in output_dir
+    low_memory = False  # Release page resources eagerly for documents of thousands of pages
+    sidecar = False  # Also write content_index.parquet (or .json) indexing blocks, cells, images and vector groups
 
-    # Ensure output directory exists
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    # Dictionaries to store file references
-    images, tables, svgs = {}, {}, {}
-    
-    # Load the PDF and process pages
-    document = fitz.open(pdf_path)
-    for page_number in range(start_page, end_page + 1):
-        page = document.load_page(page_number)
-        graphics_data = page.get_drawings()
-        
-        # Extract images
-        extracted_images = extract_images_from_page(page, output_dir, page_number)
-        if extracted_images:
-            images[page_number] = extracted_images
-        
-        # Create SVGs
-        svg_filename = os.path.join(output_dir, f"page_{page_number + 1}_vector.svg")
-        svg_path = create_svg_from_graphics_data(graphics_data, svg_filename, page.rect.width, page.rect.height)
-        if svg_path:
-            svgs[page_number] = svg_filename
-
-    # Extract and embed text content with file references
-    extract_text_and_embed_assets(pdf_path, output_dir, start_page, end_page, images, tables, svgs)
-    
-    document.close()
+    process_document(pdf_path, output_dir, start_page, end_page, workers, incremental=incremental, low_memory=low_memory,
+                     sidecar=sidecar)
 
 if __name__ == "__main__":
     main()